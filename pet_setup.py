@@ -1,10 +1,17 @@
 
 import os
+import json
+import shutil
+import hashlib
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configuration
 ASSETS_DIR = "assets"
 IMAGES_DIR = os.path.join(ASSETS_DIR, "images")
+# Downloaded copies + ETag/Last-Modified, keyed by sha1(url)
+CACHE_DIR = os.path.join(ASSETS_DIR, ".cache")
 # TODO: Replace with your actual GitHub username and repo name after uploading
 GITHUB_USER = "YukieChen" 
 REPO_NAME = "python-course-assets"
@@ -20,6 +27,60 @@ IMAGE_FILES = [
     "poop.png"
 ]
 
+def _cached_meta(filename, url):
+    """
+    Helper to locate an asset's cached copy: (cache_path, meta_path, meta).
+    meta holds the saved ETag/Last-Modified ({} if there is no usable copy).
+    """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, key + os.path.splitext(filename)[1])
+    meta_path = os.path.join(CACHE_DIR, key + ".meta")
+
+    meta = {}
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+    return cache_path, meta_path, meta
+
+def _download(filename, url, filepath):
+    """
+    Fetch one asset (runs in a worker thread) with a conditional GET.
+    The server answers 304 when our cached copy is still current, so
+    re-runs only exchange headers. Returns a short status message.
+    """
+    cache_path, meta_path, meta = _cached_meta(filename, url)
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as resp:
+            data = resp.read()
+            meta = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    except urllib.error.HTTPError as e:
+        if e.code != 304 or not headers:
+            raise
+        # Not modified: only restore the user-facing copy if it went missing
+        if os.path.exists(filepath):
+            return "Up to date."
+        shutil.copyfile(cache_path, filepath)
+        return "Restored from cache."
+
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.copyfile(cache_path, filepath)
+    return "Done!"
+
 def install_assets():
     """Derived from the 'summoning spell'. Downloads necessary images."""
     print("🔮 Summoning digital spirits... (Downloading assets)")
@@ -28,24 +89,42 @@ def install_assets():
         os.makedirs(IMAGES_DIR)
         print(f"📦 Created {IMAGES_DIR} directory.")
     
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    jobs = []
     for filename in IMAGE_FILES:
         url = f"{BASE_URL}/{filename}"
         filepath = os.path.join(IMAGES_DIR, filename)
-        if not os.path.exists(filepath):
-            try:
-                print(f"   ⬇️ Downloading {filename}...", end="")
-                
-                # Check if user forgot to update URL
-                if "YOUR_GITHUB_USER" in url:
-                    print(f"\n   ⚠️ SKIPPING: You must update 'GITHUB_USER' in setup.py first!")
-                    continue
-
-                urllib.request.urlretrieve(url, filepath)
-                print(" Done!")
-            except Exception as e:
-                print(f" Error: {e}")
-        else:
-            print(f"   ✨ {filename} already exists.")
+
+        # Check if user forgot to update URL
+        if "YOUR_GITHUB_USER" in url:
+            print(f"   ⚠️ SKIPPING {filename}: You must update 'GITHUB_USER' in setup.py first!")
+            continue
+
+        # Without a saved ETag/Last-Modified there is nothing to check an existing
+        # file against (e.g. images committed to the repo): keep it as before
+        if os.path.exists(filepath):
+            meta = _cached_meta(filename, url)[2]
+            if not (meta.get("etag") or meta.get("last_modified")):
+                print(f"   ✨ {filename} already exists.")
+                continue
+
+        jobs.append((filename, url, filepath))
+
+    # Downloads are network-bound: check/fetch them all at once instead of one by one
+    if jobs:
+        print(f"   ⬇️ Checking {len(jobs)} file(s)...")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = {pool.submit(_download, *job): job for job in jobs}
+            for future in as_completed(futures):
+                filename, _, filepath = futures[future]
+                try:
+                    print(f"   ⬇️ {filename} {future.result()}")
+                except Exception as e:
+                    if os.path.exists(filepath):
+                        print(f"   ✨ {filename} already exists (could not check for updates: {e}).")
+                    else:
+                        print(f"   ⬇️ {filename} Error: {e}")
             
     print("\n✅ Setup Complete! Your world is ready.")
 
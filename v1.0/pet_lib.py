@@ -18,25 +18,165 @@ __author__ = "Cyber-Pet Course Team"
 __description__ = "視覺化電子雞工具庫"
 
 import os
-import base64
-try:
-    from IPython.display import display, HTML, Image  # type: ignore
-    MODE = "JUPYTER"
-except ImportError:
-    MODE = "TERMINAL"
+import binascii
+import functools
+import mmap
+import importlib.util
+# Only check that IPython is installed; importing it (traitlets, etc.) is slow,
+# so the display API is loaded on the first render instead of at `import pet_lib`.
+MODE = "JUPYTER" if importlib.util.find_spec("IPython") is not None else "TERMINAL"
+if MODE == "TERMINAL":
     print("⚠️ IPython not found. Running in TERMINAL mode (Text only).")
-    # Mock classes to prevent NameError
-    def display(obj): pass
+display = HTML = Image = get_ipython = None
 
-    class HTML:
-        def __init__(self, data): self.data = data
 
-    class Image:
-        def __init__(self, filename, width=None): self.filename = filename
+def _ensure_ipython():
+    """Helper to import IPython's display API once, on first use."""
+    global display, HTML, Image, get_ipython
+    if display is None:
+        from IPython.display import display, HTML, Image  # type: ignore
+        from IPython import get_ipython  # type: ignore
+
+
+def _dispatch(terminal_impl):
+    """
+    Decorator: MODE never changes after import, so in TERMINAL mode the
+    decorated function is swapped for terminal_impl once, here, instead of
+    every call checking MODE first.
+    """
+    def decorate(func):
+        if MODE == "TERMINAL":
+            return functools.wraps(func)(terminal_impl)
+        return func
+    return decorate
 
 # Constants
 ASSETS_DIR = os.path.join("assets", "images")
 
+# Built-in images (same list as setup.py), pre-encoded at import
+IMAGE_FILES = [
+    "egg.png",
+    "happy.png",
+    "sad.png",
+    "normal.png",
+    "poop.png"
+]
+
+# Full paths of the built-in images, joined once here instead of on every lookup
+_ASSET_PATHS = {name: os.path.join(ASSETS_DIR, name) for name in IMAGE_FILES}
+
+# Data-URI MIME type by extension (JPEG assets stay JPEG, sprites with alpha stay PNG)
+_IMG_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif"
+}
+
+# Encoded image cache: {path: "data:<mime>;base64,..."}
+_IMG_CACHE = {}
+
+# Resolved image paths: {filename: path} (only hits, so a later setup.py run is picked up)
+_PATH_CACHE = {}
+
+# Outputs re-drawn by update=True: {key: (cell execution count, DisplayHandle)}
+_DISPLAY_IDS = {}
+
+# ==========================================
+# HTML Templates (只建立一次，每次呼叫用 str.format 填值)
+# ==========================================
+
+def _minify(html):
+    """Helper to collapse template indentation/newlines (run once at import, keeps outputs small)."""
+    return " ".join(html.split())
+
+
+_IMAGE_TMPL = _minify("""
+<div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
+    <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
+</div>
+""")
+
+_STATS_TMPL = _minify("""
+<div style="
+    border: 2px solid #333;
+    border-radius: 10px;
+    padding: 10px;
+    width: 300px;
+    background-color: #f0f0f0;
+    font-family: Arial, sans-serif;">
+    <h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>
+    {bars}
+</div>
+""")
+
+_BAR_TMPL = _minify("""
+<div style="margin-bottom: 5px;">
+    <strong>{label}:</strong> {value}/100
+    <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
+        <div style="
+            background-color: {color};
+            width: {width}%;
+            height: 100%;
+            border-radius: 5px;
+            transition: width 0.5s;">
+        </div>
+    </div>
+</div>
+""")
+
+_SAY_TMPL = _minify("""
+<div style="display: flex; align-items: center; margin-bottom: 10px;">
+    <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
+    <div style="
+        background-color: #fff;
+        border: 2px solid #333;
+        color: #333;
+        border-radius: 15px;
+        padding: 8px 15px;
+        position: relative;
+        display: inline-block;">
+        {message}
+        <div style="
+            content: '';
+            position: absolute;
+            left: -6px;
+            top: 50%;
+            width: 10px;
+            height: 10px;
+            background-color: #fff;
+            border-left: 2px solid #333;
+            border-bottom: 2px solid #333;
+            transform: translateY(-50%) rotate(45deg);">
+        </div>
+    </div>
+</div>
+""")
+
+_LABEL_TMPL = _minify("""
+<div style="
+    font-family: 'Comic Sans MS', 'Chalkboard SE', sans-serif;
+    background-color: #FFEB3B;
+    color: #333;
+    padding: 5px 15px;
+    border-radius: 15px;
+    border: 3px solid #FBC02D;
+    display: inline-block;
+    font-weight: bold;
+    font-size: 1.2em;
+    box-shadow: 2px 2px 5px rgba(0,0,0,0.2);
+    margin-bottom: 10px;
+    transform: rotate(-2deg);">
+    Hello, my name is {name}
+</div>
+""")
+
+_SCENE_TMPL = _minify("""
+<div style="display: flex; flex-direction: column; align-items: flex-start; gap: 5px;">
+    {content}
+</div>
+""")
+
 # ==========================================
 # Utility Functions (版本管理)
 # ==========================================
@@ -84,45 +224,141 @@ def check_compatibility(required_version):
 
 def _get_img_path(filename):
     """Helper to get full path and verify existence."""
-    path = os.path.join(ASSETS_DIR, filename)
+    cached = _PATH_CACHE.get(filename)
+    if cached is not None:
+        return cached
+    path = _ASSET_PATHS.get(filename) or os.path.join(ASSETS_DIR, filename)
     if not os.path.exists(path):
         print(f"⚠️ Warning: Image {filename} not found. Did you run setup.py?")
         return None
+    _PATH_CACHE[filename] = path
     return path
 
 
-def show_image(filename, width=200):
-    """Display a raw image file."""
-    if MODE == "TERMINAL":
-        print(f"[IMAGE] {filename}")
+def reset_asset_cache():
+    """
+    Forget resolved paths and encoded images.
+    Call this after replacing files in assets/images during a session.
+    """
+    _PATH_CACHE.clear()
+    _IMG_CACHE.clear()
+
+
+def _encode_img(path):
+    """Helper to read an image once and cache its base64 data URI."""
+    img_src = _IMG_CACHE.get(path)
+    if img_src is None:
+        mime = _IMG_MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/png")
+        with open(path, "rb") as f:
+            # Encode straight from the mapped file pages (no intermediate bytes copy);
+            # mmap refuses empty files, which simply encode to ""
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    encoded = binascii.b2a_base64(view, newline=False).decode("ascii")
+            else:
+                encoded = ""
+        img_src = f"data:{mime};base64,{encoded}"
+        _IMG_CACHE[path] = img_src
+    return img_src
+
+
+def _preload_assets():
+    """Helper to encode the built-in images once, at import time."""
+    if not os.path.isdir(ASSETS_DIR):
         return
+    for filename in IMAGE_FILES:
+        try:
+            _encode_img(_ASSET_PATHS[filename])
+        except OSError:
+            pass
+
 
+if MODE == "JUPYTER":
+    _preload_assets()
+
+
+def _image_html(filename, width=200):
+    """Helper to build the boxed <img> HTML ("" if the image can't be loaded)."""
     path = _get_img_path(filename)
-    if path:
-        # Check if we need to embed as base64 (for Colab HTML support)
-        try:
-            with open(path, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
-            img_src = f"data:image/png;base64,{encoded}"
-        except Exception as e:
-            print(f"Error loading image: {e}")
-            return
-
-        # Use HTML for better control over sizing (maintain aspect ratio within box)
-        html = f"""
-        <div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
-            <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
-        </div>
-        """
+    if not path:
+        return ""
+
+    # Check if we need to embed as base64 (for Colab HTML support)
+    try:
+        img_src = _encode_img(path)
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        return ""
+
+    # Use HTML for better control over sizing (maintain aspect ratio within box)
+    return _IMAGE_TMPL.format(width=width, img_src=img_src)
+
+
+def _current_cell():
+    """Helper to identify the running cell (IPython execution count, None outside a kernel)."""
+    ip = get_ipython()
+    return ip.execution_count if ip is not None else None
+
+
+
+def _update_display(key, obj):
+    """
+    Helper to show obj in the output registered under key.
+    The first call in a cell creates the output (display_id), later calls in
+    the same cell redraw it in place instead of appending another one.
+    """
+    cell = _current_cell()
+    entry = _DISPLAY_IDS.get(key)
+    if entry is not None and entry[0] == cell:
+        entry[1].update(obj)
+    else:
+        # Outside a kernel display() just prints obj and returns no handle, so
+        # there is nothing to redraw later: later calls display again instead
+        handle = display(obj, display_id=True)
+        if handle is not None:
+            _DISPLAY_IDS[key] = (cell, handle)
+        else:
+            _DISPLAY_IDS.pop(key, None)
+
+def _render_html(html, update_key=None):
+    """Helper to display HTML (update_key: see _update_display)."""
+    _ensure_ipython()
+    if update_key is None:
         display(HTML(html))
+    else:
+        _update_display(update_key, HTML(html))
 
 
-def show_egg():
-    """Lesson 1: Show the Egg."""
-    if MODE == "TERMINAL":
-        print("(O) [Mystery Egg]")
+def _show_image_terminal(filename, width=200, mode="box"):
+    print(f"[IMAGE] {filename}")
+
+
+@_dispatch(_show_image_terminal)
+def show_image(filename, width=200, mode="box"):
+    """
+    Display a raw image file.
+    mode="box" centers it in a square HTML box; mode="raw" sends the file
+    through IPython's Image output instead of base64-in-HTML.
+    """
+    if mode == "raw":
+        path = _get_img_path(filename)
+        if path:
+            _ensure_ipython()
+            display(Image(filename=path, width=width))
         return
 
+    html = _image_html(filename, width)
+    if html:
+        _render_html(html)
+
+
+def _show_egg_terminal():
+    print("(O) [Mystery Egg]")
+
+
+@_dispatch(_show_egg_terminal)
+def show_egg():
+    """Lesson 1: Show the Egg."""
     print("Mystery Egg found!")
     show_image("egg.png")
 
@@ -131,156 +367,111 @@ def show_egg():
 summon = show_egg
 
 
-def show_pet(mood="normal"):
-    """Show the pet with a specific mood (happy, sad, normal)."""
-    if MODE == "TERMINAL":
-        print(f"(^.{mood}.^) [Pet is {mood}]")
-        return
+def _show_pet_terminal(mood="normal", update=False):
+    print(f"(^.{mood}.^) [Pet is {mood}]")
+
+
+@_dispatch(_show_pet_terminal)
+def show_pet(mood="normal", update=False):
+    """
+    Show the pet with a specific mood (happy, sad, normal).
+    update=True redraws the pet shown earlier in this cell instead of adding another.
+    """
+    html = _image_html(f"{mood}.png")
+    if html:
+        _render_html(html, "pet" if update else None)
+
+
+# Bar colors by decile (value // 10 for 0-100): red below 20, orange below 50, green otherwise
+_BAR_COLORS = ("#ff4444",) * 2 + ("#ffbb33",) * 3 + ("#00C851",) * 6
 
-    filename = f"{mood}.png"
-    show_image(filename)
 
+def _bar_color(value):
+    """Helper to pick the bar color (red / orange / green) for a value already clamped to 0-100."""
+    return _BAR_COLORS[int(value) // 10]
+
+
+def _stats_html(name, hp, hunger, happiness=None):
+    """Helper to build the stat panel HTML (used by show_stats and show_scene)."""
+    # Clamp each stat to 0-100 once; the clamped value drives both width and color
+    hp_c = max(0, min(100, hp))
+    hunger_c = max(0, min(100, hunger))
+    bars = _BAR_TMPL.format(label="HP", value=hp, color=_bar_color(hp_c), width=hp_c)
+    bars += _BAR_TMPL.format(label="Hunger", value=hunger, color=_bar_color(100 - hunger_c), width=hunger_c)
+    if happiness is not None:
+        happiness_c = max(0, min(100, happiness))
+        bars += _BAR_TMPL.format(label="Happiness", value=happiness, color=_bar_color(happiness_c), width=happiness_c)
+    return _STATS_TMPL.format(name=name, bars=bars)
 
-def show_stats(name, hp, hunger, happiness=None):
+
+def _show_stats_terminal(name, hp, hunger, happiness=None, update=False):
+    print(f"--- {name} ---")
+    print(f"HP:       [{'#' * (max(0, min(100, hp)) // 10):<10}] {hp}/100")
+    print(f"Hunger:   [{'#' * (max(0, min(100, hunger)) // 10):<10}] {hunger}/100")
+    if happiness is not None:
+        print(f"Happy:    [{'#' * (max(0, min(100, happiness)) // 10):<10}] {happiness}/100")
+    print("----------------")
+
+
+@_dispatch(_show_stats_terminal)
+def show_stats(name, hp, hunger, happiness=None, update=False):
     """
     Render a beautiful HTML stat bar.
     Progress bars change color based on value.
     """
-    if MODE == "TERMINAL":
-        print(f"--- {name} ---")
-        print(f"HP:       [{'#' * (hp//10):<10}] {hp}/100")
-        print(f"Hunger:   [{'#' * (hunger//10):<10}] {hunger}/100")
-        if happiness is not None:
-            print(f"Happy:    [{'#' * (happiness//10):<10}] {happiness}/100")
-        print("----------------")
-        return
+    _render_html(_stats_html(name, hp, hunger, happiness), "stats" if update else None)
 
-    def _bar_color(value):
-        if value < 20:
-            return "#ff4444"  # Red
-        if value < 50:
-            return "#ffbb33"  # Orange
-        return "#00C851"  # Green
 
-    html = f"""
-    <div style="
-        border: 2px solid #333; 
-        border-radius: 10px; 
-        padding: 10px; 
-        width: 300px; 
-        background-color: #f0f0f0; 
-        font-family: Arial, sans-serif;">
-        
-        <h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>
-        
-        <!-- HP Bar -->
-        <div style="margin-bottom: 5px;">
-            <strong>HP:</strong> {hp}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="
-                    background-color: {_bar_color(hp)}; 
-                    width: {min(hp, 100)}%; 
-                    height: 100%; 
-                    border-radius: 5px;
-                    transition: width 0.5s;">
-                </div>
-            </div>
-        </div>
+def _say_html(name, message):
+    """Helper to build the speech bubble HTML."""
+    return _SAY_TMPL.format(name=name, message=message)
 
-        <!-- Hunger Bar -->
-        <div style="margin-bottom: 5px;">
-            <strong>Hunger:</strong> {hunger}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="
-                    background-color: {_bar_color(100 - hunger)}; 
-                    width: {min(hunger, 100)}%; 
-                    height: 100%; 
-                    border-radius: 5px;">
-                </div>
-            </div>
-        </div>
-    """
 
-    if happiness is not None:
-        html += f"""
-        <!-- Happiness Bar -->
-        <div>
-            <strong>Happiness:</strong> {happiness}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="
-                    background-color: {_bar_color(happiness)}; 
-                    width: {min(happiness, 100)}%; 
-                    height: 100%; 
-                    border-radius: 5px;">
-                </div>
-            </div>
-        </div>
-        """
-
-    html += "</div>"
-    display(HTML(html))
+def _say_terminal(name, message):
+    print(f"{name}: {message}")
 
 
+@_dispatch(_say_terminal)
 def say(name, message):
     """Render a speech bubble next to the name."""
-    if MODE == "TERMINAL":
-        print(f"{name}: {message}")
-        return
+    _render_html(_say_html(name, message))
+
+
+def _label_html(name):
+    """Helper to build the name tag HTML."""
+    return _LABEL_TMPL.format(name=name)
 
-    html = f"""
-    <div style="display: flex; align-items: center; margin-bottom: 10px;">
-        <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
-        <div style="
-            background-color: #fff; 
-            border: 2px solid #333; 
-            color: #333;
-            border-radius: 15px; 
-            padding: 8px 15px; 
-            position: relative;
-            display: inline-block;">
-            {message}
-            <div style="
-                content: '';
-                position: absolute;
-                left: -6px;
-                top: 50%;
-                width: 10px;
-                height: 10px;
-                background-color: #fff;
-                border-left: 2px solid #333;
-                border-bottom: 2px solid #333;
-                transform: translateY(-50%) rotate(45deg);">
-            </div>
-        </div>
-    </div>
-    """
-    display(HTML(html))
 
+def _set_label_terminal(name, update=False):
+    print(f"[LABEL] Assigned Name: {name}")
 
-def set_label(name):
+
+@_dispatch(_set_label_terminal)
+def set_label(name, update=False):
     """
     Lesson 2: Set the label (name) of the pet.
     Visualizes a name tag above the pet.
     """
-    if MODE == "TERMINAL":
-        print(f"[LABEL] Assigned Name: {name}")
-        return
+    _render_html(_label_html(name), "label" if update else None)
 
-    html = f"""
-    <div style="
-        font-family: 'Comic Sans MS', 'Chalkboard SE', sans-serif;
-        background-color: #FFEB3B; 
-        color: #333; 
-        padding: 5px 15px; 
-        border-radius: 15px; 
-        border: 3px solid #FBC02D;
-        display: inline-block;
-        font-weight: bold;
-        font-size: 1.2em;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.2);
-        margin-bottom: 10px;
-        transform: rotate(-2deg);">
-        Hello, my name is {name}
-    </div>
+
+def _show_scene_terminal(name, mood, hp, hunger, happiness=None, message=None, update=False):
+    set_label(name)
+    show_pet(mood)
+    show_stats(name, hp, hunger, happiness)
+    if message is not None:
+        say(name, message)
+
+
+@_dispatch(_show_scene_terminal)
+def show_scene(name, mood, hp, hunger, happiness=None, message=None, update=False):
+    """
+    Show the name tag, pet, stats (and an optional speech bubble) at once.
+    Everything goes out as ONE HTML output, so a game loop pays a single
+    display round-trip per tick instead of four.
+    With update=True the tick redraws the previous scene of the same cell.
     """
-    display(HTML(html))
+    content = _label_html(name) + _image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness)
+    if message is not None:
+        content += _say_html(name, message)
+    _render_html(_SCENE_TMPL.format(content=content), "scene" if update else None)
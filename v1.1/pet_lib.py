@@ -19,28 +19,168 @@ __author__ = "Cyber-Pet Course Team"
 __description__ = "視覺化電子雞工具庫 (Refactored)"
 
 import os
-import base64
-from typing import Optional, Union
-
-# 嘗試匯入 IPython 環境 (Jupyter Support)
-try:
-    from IPython.display import display, HTML, Image  # type: ignore
-    MODE = "JUPYTER"
-except ImportError:
-    MODE = "TERMINAL"
+import binascii
+import functools
+import mmap
+import importlib.util
+from typing import Optional, Union, Dict
+
+# 偵測 IPython 環境 (Jupyter Support)
+# Only check that IPython is installed; importing it (traitlets, etc.) is slow,
+# so the display API is loaded on the first render instead of at `import pet_lib`.
+MODE = "JUPYTER" if importlib.util.find_spec("IPython") is not None else "TERMINAL"
+if MODE == "TERMINAL":
     print("⚠️ IPython not found. Running in TERMINAL mode (Text only).")
-    # Mock classes for Terminal fallback
-    def display(obj): pass
+display = HTML = Image = get_ipython = None
 
-    class HTML:
-        def __init__(self, data): self.data = data
 
-    class Image:
-        def __init__(self, filename, width=None): self.filename = filename
+def _ensure_ipython() -> None:
+    """Helper to import IPython's display API once, on first use."""
+    global display, HTML, Image, get_ipython
+    if display is None:
+        from IPython.display import display, HTML, Image  # type: ignore
+        from IPython import get_ipython  # type: ignore
+
+
+def _dispatch(terminal_impl):
+    """
+    Decorator: MODE never changes after import, so in TERMINAL mode the
+    decorated function is swapped for terminal_impl once, here, instead of
+    every call checking MODE first.
+    """
+    def decorate(func):
+        if MODE == "TERMINAL":
+            return functools.wraps(func)(terminal_impl)
+        return func
+    return decorate
 
 # Constants
 ASSETS_DIR = os.path.join("assets", "images")
 
+# Built-in images (same list as setup.py), pre-encoded at import
+IMAGE_FILES = [
+    "egg.png",
+    "happy.png",
+    "sad.png",
+    "normal.png",
+    "poop.png"
+]
+
+# Full paths of the built-in images, joined once here instead of on every lookup
+_ASSET_PATHS: Dict[str, str] = {name: os.path.join(ASSETS_DIR, name) for name in IMAGE_FILES}
+
+# Data-URI MIME type by extension (JPEG assets stay JPEG, sprites with alpha stay PNG)
+_IMG_MIME_TYPES: Dict[str, str] = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif"
+}
+
+# Encoded image cache: {path: "data:<mime>;base64,..."}
+_IMG_CACHE: Dict[str, str] = {}
+
+# Resolved image paths: {filename: path} (only hits, so a later setup.py run is picked up)
+_PATH_CACHE: Dict[str, str] = {}
+
+# Outputs re-drawn by update=True: {key: (cell execution count, DisplayHandle)}
+_DISPLAY_IDS: Dict[str, tuple] = {}
+
+# ==========================================
+# HTML Templates (只建立一次，每次呼叫用 str.format 填值)
+# ==========================================
+
+def _minify(html: str) -> str:
+    """Helper to collapse template indentation/newlines (run once at import, keeps outputs small)."""
+    return " ".join(html.split())
+
+
+_IMAGE_TMPL = _minify("""
+<div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
+    <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
+</div>
+""")
+
+_STATS_TMPL = _minify("""
+<div style="
+    border: 2px solid #333;
+    border-radius: 10px;
+    padding: 10px;
+    width: 300px;
+    background-color: #f0f0f0;
+    font-family: Arial, sans-serif;">
+    <h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>
+    {bars}
+</div>
+""")
+
+_BAR_TMPL = _minify("""
+<div style="margin-bottom: 5px;">
+    <strong>{label}:</strong> {value}/100
+    <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
+        <div style="
+            background-color: {color};
+            width: {width}%;
+            height: 100%;
+            border-radius: 5px;
+            transition: width 0.5s;">
+        </div>
+    </div>
+</div>
+""")
+
+_SAY_TMPL = _minify("""
+<div style="display: flex; align-items: center; margin-bottom: 10px;">
+    <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
+    <div style="
+        background-color: #fff;
+        border: 2px solid #333;
+        color: #333;
+        border-radius: 15px;
+        padding: 8px 15px;
+        position: relative;
+        display: inline-block;">
+        {message}
+        <div style="
+            content: '';
+            position: absolute;
+            left: -6px;
+            top: 50%;
+            width: 10px;
+            height: 10px;
+            background-color: #fff;
+            border-left: 2px solid #333;
+            border-bottom: 2px solid #333;
+            transform: translateY(-50%) rotate(45deg);">
+        </div>
+    </div>
+</div>
+""")
+
+_LABEL_TMPL = _minify("""
+<div style="
+    font-family: 'Comic Sans MS', 'Chalkboard SE', sans-serif;
+    background-color: #FFEB3B;
+    color: #333;
+    padding: 5px 15px;
+    border-radius: 15px;
+    border: 3px solid #FBC02D;
+    display: inline-block;
+    font-weight: bold;
+    font-size: 1.2em;
+    box-shadow: 2px 2px 5px rgba(0,0,0,0.2);
+    margin-bottom: 10px;
+    transform: rotate(-2deg);">
+    Hello, my name is {name}
+</div>
+""")
+
+_SCENE_TMPL = _minify("""
+<div style="display: flex; flex-direction: column; align-items: flex-start; gap: 5px;">
+    {content}
+</div>
+""")
+
 # ==========================================
 # Utility Functions (工具函式)
 # ==========================================
@@ -63,69 +203,157 @@ def check_compatibility(required_version: str) -> bool:
 
 def _get_img_path(filename: str) -> Optional[str]:
     """Helper to get full path and verify existence."""
-    path = os.path.join(ASSETS_DIR, filename)
+    cached = _PATH_CACHE.get(filename)
+    if cached is not None:
+        return cached
+    path = _ASSET_PATHS.get(filename) or os.path.join(ASSETS_DIR, filename)
     if not os.path.exists(path):
         print(f"⚠️ Warning: Image {filename} not found. Did you run setup.py?")
         return None
+    _PATH_CACHE[filename] = path
     return path
 
 
-def _render_html(html_content: str):
-    """Internal helper to render HTML content safely."""
-    if MODE == "JUPYTER":
+def reset_asset_cache() -> None:
+    """
+    Forget resolved paths and encoded images.
+    Call this after replacing files in assets/images during a session.
+    """
+    _PATH_CACHE.clear()
+    _IMG_CACHE.clear()
+
+
+def _encode_img(path: str) -> str:
+    """Helper to read an image once and cache its base64 data URI."""
+    img_src = _IMG_CACHE.get(path)
+    if img_src is None:
+        mime = _IMG_MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/png")
+        with open(path, "rb") as f:
+            # Encode straight from the mapped file pages (no intermediate bytes copy);
+            # mmap refuses empty files, which simply encode to ""
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    encoded = binascii.b2a_base64(view, newline=False).decode("ascii")
+            else:
+                encoded = ""
+        img_src = f"data:{mime};base64,{encoded}"
+        _IMG_CACHE[path] = img_src
+    return img_src
+
+
+def _preload_assets():
+    """Helper to encode the built-in images once, at import time."""
+    if not os.path.isdir(ASSETS_DIR):
+        return
+    for filename in IMAGE_FILES:
+        try:
+            _encode_img(_ASSET_PATHS[filename])
+        except OSError:
+            pass
+
+
+if MODE == "JUPYTER":
+    _preload_assets()
+
+
+def _current_cell() -> Optional[int]:
+    """Helper to identify the running cell (IPython execution count, None outside a kernel)."""
+    ip = get_ipython()
+    return ip.execution_count if ip is not None else None
+
+
+
+def _update_display(key, obj):
+    """
+    Helper to show obj in the output registered under key.
+    The first call in a cell creates the output (display_id), later calls in
+    the same cell redraw it in place instead of appending another one.
+    """
+    cell = _current_cell()
+    entry = _DISPLAY_IDS.get(key)
+    if entry is not None and entry[0] == cell:
+        entry[1].update(obj)
+    else:
+        # Outside a kernel display() just prints obj and returns no handle, so
+        # there is nothing to redraw later: later calls display again instead
+        handle = display(obj, display_id=True)
+        if handle is not None:
+            _DISPLAY_IDS[key] = (cell, handle)
+        else:
+            _DISPLAY_IDS.pop(key, None)
+
+def _render_html_terminal(html_content: str, update_key: Optional[str] = None):
+    pass
+
+@_dispatch(_render_html_terminal)
+def _render_html(html_content: str, update_key: Optional[str] = None):
+    """Internal helper to render HTML content safely (update_key: see _update_display)."""
+    _ensure_ipython()
+    if update_key is None:
         display(HTML(html_content))
     else:
-        # In terminal mode, we might want to strip HTML or just ignore
-        pass
+        _update_display(update_key, HTML(html_content))
+
+
+# Bar colors by decile (value // 10 for 0-100): red below 20, orange below 50, green otherwise
+_BAR_COLORS = ("#ff4444",) * 2 + ("#ffbb33",) * 3 + ("#00C851",) * 6
 
 
 def _get_bar_color(value: int) -> str:
-    """決定狀態條的顏色 (Refactored Logic)"""
-    if value < 20:
-        return "#ff4444"  # Red (Critical)
-    if value < 50:
-        return "#ffbb33"  # Orange (Warning)
-    return "#00C851"  # Green (Good)
+    """決定狀態條的顏色 (Refactored Logic, value 需已限制在 0-100)"""
+    return _BAR_COLORS[int(value) // 10]
 
 # ==========================================
 # Core Functions (核心功能)
 # ==========================================
 
 
-def show_image(filename: str, width: int = 200):
-    """顯示原始圖片檔案"""
-    if MODE == "TERMINAL":
-        print(f"[IMAGE] {filename}")
-        return
-
+def _image_html(filename: str, width: int = 200) -> str:
+    """Helper to build the boxed <img> HTML ("" if the image can't be loaded)."""
     path = _get_img_path(filename)
     if not path:
-        return
+        return ""
 
     # Check if we need to embed as base64 (for Colab HTML support)
     try:
-        with open(path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
-        img_src = f"data:image/png;base64,{encoded}"
+        img_src = _encode_img(path)
     except Exception as e:
         print(f"Error loading image: {e}")
-        return
+        return ""
 
     # Use HTML for better control over sizing
-    html = f"""
-    <div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
-        <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
-    </div>
+    return _IMAGE_TMPL.format(width=width, img_src=img_src)
+
+
+def _show_image_terminal(filename: str, width: int = 200, mode: str = "box"):
+    print(f"[IMAGE] {filename}")
+
+
+@_dispatch(_show_image_terminal)
+def show_image(filename: str, width: int = 200, mode: str = "box"):
+    """
+    顯示原始圖片檔案
+    mode="box": 置中於正方形 HTML 框內；mode="raw": 直接用 Image 輸出 (不經過 base64 HTML)
     """
-    _render_html(html)
+    if mode == "raw":
+        path = _get_img_path(filename)
+        if path:
+            _ensure_ipython()
+            display(Image(filename=path, width=width))
+        return
 
+    html = _image_html(filename, width)
+    if html:
+        _render_html(html)
 
+
+def _show_egg_terminal():
+    print("(O) [Mystery Egg]")
+
+
+@_dispatch(_show_egg_terminal)
 def show_egg():
     """Lesson 1: 顯示神秘蛋"""
-    if MODE == "TERMINAL":
-        print("(O) [Mystery Egg]")
-        return
-
     print("Mystery Egg found!")
     show_image("egg.png")
 
@@ -134,132 +362,113 @@ def show_egg():
 summon = show_egg
 
 
-def show_pet(mood: str = "normal"):
-    """顯示寵物表情 (happy, sad, normal)"""
-    if MODE == "TERMINAL":
-        print(f"(^.{mood}.^) [Pet is {mood}]")
-        return
+def _show_pet_terminal(mood: str = "normal", update: bool = False):
+    print(f"(^.{mood}.^) [Pet is {mood}]")
 
-    filename = f"{mood}.png"
-    show_image(filename)
 
-
-def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None):
+@_dispatch(_show_pet_terminal)
+def show_pet(mood: str = "normal", update: bool = False):
     """
-    Render a beautiful HTML stat bar.
-    Refactored in v1.1 to use _render_html helper.
+    顯示寵物表情 (happy, sad, normal)
+    update=True 時重畫本 cell 上一次的寵物，而不是再新增一張。
     """
-    if MODE == "TERMINAL":
-        print(f"--- {name} ---")
-        print(f"HP:       [{'#' * (hp//10):<10}] {hp}/100")
-        print(f"Hunger:   [{'#' * (hunger//10):<10}] {hunger}/100")
-        if happiness is not None:
-            print(f"Happy:    [{'#' * (happiness//10):<10}] {happiness}/100")
-        print("----------------")
-        return
+    html = _image_html(f"{mood}.png")
+    if html:
+        _render_html(html, "pet" if update else None)
+
 
+def _stats_html(name: str, hp: int, hunger: int, happiness: Optional[int] = None) -> str:
+    """Helper to build the stat panel HTML (used by show_stats and show_scene)."""
     # Internal helper for bar HTML generation (New in v1.1)
     def _create_bar_html(label, value, reverse_color=False):
         # For hunger: higher value = more hungry = red (reverse logic)
-        color_value = (100 - value) if reverse_color else value
-        color = _get_bar_color(color_value)
-        return f"""
-        <div style="margin-bottom: 5px;">
-            <strong>{label}:</strong> {value}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="
-                    background-color: {color}; 
-                    width: {min(value, 100)}%; 
-                    height: 100%; 
-                    border-radius: 5px;
-                    transition: width 0.5s;">
-                </div>
-            </div>
-        </div>
-        """
+        # Clamp to 0-100 once; the clamped value drives both width and color
+        pct = max(0, min(100, value))
+        color = _get_bar_color((100 - pct) if reverse_color else pct)
+        return _BAR_TMPL.format(label=label, value=value, color=color, width=pct)
 
-    content_html = f"""<h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>"""
-    content_html += _create_bar_html("HP", hp)
-    content_html += _create_bar_html("Hunger", hunger, reverse_color=True)
+    bars_html = _create_bar_html("HP", hp)
+    bars_html += _create_bar_html("Hunger", hunger, reverse_color=True)
 
     if happiness is not None:
-        content_html += _create_bar_html("Happiness", happiness)
+        bars_html += _create_bar_html("Happiness", happiness)
 
-    container_html = f"""
-    <div style="
-        border: 2px solid #333; 
-        border-radius: 10px; 
-        padding: 10px; 
-        width: 300px; 
-        background-color: #f0f0f0; 
-        font-family: Arial, sans-serif;">
-        {content_html}
-    </div>
+    return _STATS_TMPL.format(name=name, bars=bars_html)
+
+
+def _show_stats_terminal(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+                         update: bool = False):
+    print(f"--- {name} ---")
+    print(f"HP:       [{'#' * (max(0, min(100, hp)) // 10):<10}] {hp}/100")
+    print(f"Hunger:   [{'#' * (max(0, min(100, hunger)) // 10):<10}] {hunger}/100")
+    if happiness is not None:
+        print(f"Happy:    [{'#' * (max(0, min(100, happiness)) // 10):<10}] {happiness}/100")
+    print("----------------")
+
+
+@_dispatch(_show_stats_terminal)
+def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+               update: bool = False):
+    """
+    Render a beautiful HTML stat bar.
+    Refactored in v1.1 to use _render_html helper.
     """
+    _render_html(_stats_html(name, hp, hunger, happiness), "stats" if update else None)
+
 
-    _render_html(container_html)
+def _say_html(name: str, message: str) -> str:
+    """Helper to build the speech bubble HTML."""
+    return _SAY_TMPL.format(name=name, message=message)
 
 
+def _say_terminal(name: str, message: str):
+    print(f"{name}: {message}")
+
+
+@_dispatch(_say_terminal)
 def say(name: str, message: str):
     """Render a speech bubble next to the name."""
-    if MODE == "TERMINAL":
-        print(f"{name}: {message}")
-        return
+    _render_html(_say_html(name, message))
+
+
+def _label_html(name: str) -> str:
+    """Helper to build the name tag HTML."""
+    return _LABEL_TMPL.format(name=name)
 
-    html = f"""
-    <div style="display: flex; align-items: center; margin-bottom: 10px;">
-        <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
-        <div style="
-            background-color: #fff; 
-            border: 2px solid #333; 
-            color: #333;
-            border-radius: 15px; 
-            padding: 8px 15px; 
-            position: relative;
-            display: inline-block;">
-            {message}
-            <div style="
-                content: '';
-                position: absolute;
-                left: -6px;
-                top: 50%;
-                width: 10px;
-                height: 10px;
-                background-color: #fff;
-                border-left: 2px solid #333;
-                border-bottom: 2px solid #333;
-                transform: translateY(-50%) rotate(45deg);">
-            </div>
-        </div>
-    </div>
-    """
-    _render_html(html)
 
+def _set_label_terminal(name: str, update: bool = False):
+    print(f"[LABEL] Assigned Name: {name}")
 
-def set_label(name: str):
+
+@_dispatch(_set_label_terminal)
+def set_label(name: str, update: bool = False):
     """
     Lesson 2: Set the label (name) of the pet.
     Visualizes a name tag above the pet.
     """
-    if MODE == "TERMINAL":
-        print(f"[LABEL] Assigned Name: {name}")
-        return
+    _render_html(_label_html(name), "label" if update else None)
 
-    html = f"""
-    <div style="
-        font-family: 'Comic Sans MS', 'Chalkboard SE', sans-serif;
-        background-color: #FFEB3B; 
-        color: #333; 
-        padding: 5px 15px; 
-        border-radius: 15px; 
-        border: 3px solid #FBC02D;
-        display: inline-block;
-        font-weight: bold;
-        font-size: 1.2em;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.2);
-        margin-bottom: 10px;
-        transform: rotate(-2deg);">
-        Hello, my name is {name}
-    </div>
+
+def _show_scene_terminal(name: str, mood: str, hp: int, hunger: int,
+                         happiness: Optional[int] = None, message: Optional[str] = None,
+                         update: bool = False):
+    set_label(name)
+    show_pet(mood)
+    show_stats(name, hp, hunger, happiness)
+    if message is not None:
+        say(name, message)
+
+
+@_dispatch(_show_scene_terminal)
+def show_scene(name: str, mood: str, hp: int, hunger: int,
+               happiness: Optional[int] = None, message: Optional[str] = None,
+               update: bool = False):
+    """
+    一次顯示名牌、寵物表情、狀態條 (以及選擇性的對話氣泡)。
+    全部合併成單一 HTML 輸出，遊戲迴圈每回合只需一次 display。
+    update=True 時重畫本 cell 上一次的畫面 (display_id)，不會一路往下疊。
     """
-    _render_html(html)
+    content = _label_html(name) + _image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness)
+    if message is not None:
+        content += _say_html(name, message)
+    _render_html(_SCENE_TMPL.format(content=content), "scene" if update else None)
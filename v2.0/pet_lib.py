@@ -7,6 +7,7 @@ Cyber-Pet Library - 視覺化電子雞工具庫 (v2.0)
 主要功能：
 - show_pet_dict: 支援傳入字典
 - show_stats: 支援全參數 (為了相容性)
+- show_scene: 名牌、表情、數值、對話一次輸出
 - save_pet/load_pet: 檔案存取功能 (L19)
 
 Changelog:
@@ -19,26 +20,121 @@ __version__ = "2.0.0"
 __author__ = "Cyber-Pet Course Team"
 
 import os
-import base64
+import binascii
+import functools
+import importlib.util
 import json
+import mmap
 from typing import Optional, Union, Dict, Any
 
-# 嘗試匯入 IPython 環境 (Jupyter Support)
-try:
-    from IPython.display import display, HTML, Image  # type: ignore
-    MODE = "JUPYTER"
-except ImportError:
-    MODE = "TERMINAL"
-    # Mock classes for Terminal fallback
-    def display(obj): pass 
-    class HTML:
-        def __init__(self, data): self.data = data
-    class Image:
-        def __init__(self, filename, width=None): self.filename = filename
+# 偵測 IPython 環境 (Jupyter Support)
+# Only check that IPython is installed; importing it (traitlets, etc.) is slow,
+# so the display API is loaded on the first render instead of at `import pet_lib`.
+MODE = "JUPYTER" if importlib.util.find_spec("IPython") is not None else "TERMINAL"
+display = HTML = Image = get_ipython = None
+
+def _ensure_ipython() -> None:
+    """Helper to import IPython's display API once, on first use."""
+    global display, HTML, Image, get_ipython
+    if display is None:
+        from IPython.display import display, HTML, Image  # type: ignore
+        from IPython import get_ipython  # type: ignore
+
+def _dispatch(terminal_impl):
+    """
+    Decorator: MODE never changes after import, so in TERMINAL mode the
+    decorated function is swapped for terminal_impl once, here, instead of
+    every call checking MODE first.
+    """
+    def decorate(func):
+        if MODE == "TERMINAL":
+            return functools.wraps(func)(terminal_impl)
+        return func
+    return decorate
 
 # Constants
 ASSETS_DIR = os.path.join("assets", "images")
 
+# Built-in images (same list as setup.py), pre-encoded at import
+IMAGE_FILES = [
+    "egg.png",
+    "happy.png",
+    "sad.png",
+    "normal.png",
+    "poop.png"
+]
+
+# Full paths of the built-in images, joined once here instead of on every lookup
+_ASSET_PATHS: Dict[str, str] = {name: os.path.join(ASSETS_DIR, name) for name in IMAGE_FILES}
+
+# Data-URI MIME type by extension (JPEG assets stay JPEG, sprites with alpha stay PNG)
+_IMG_MIME_TYPES: Dict[str, str] = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif"
+}
+
+# Encoded image cache: {path: "data:<mime>;base64,..."}
+_IMG_CACHE: Dict[str, str] = {}
+
+# Resolved image paths: {filename: path} (only hits, so a later setup.py run is picked up)
+_PATH_CACHE: Dict[str, str] = {}
+
+# Outputs re-drawn by update=True: {key: (cell execution count, DisplayHandle)}
+_DISPLAY_IDS: Dict[str, tuple] = {}
+
+# ==========================================
+# HTML Templates (只建立一次，每次呼叫用 str.format 填值)
+# ==========================================
+
+def _minify(html: str) -> str:
+    """Helper to collapse template indentation/newlines (run once at import, keeps outputs small)."""
+    return " ".join(html.split())
+
+_IMAGE_TMPL = _minify("""
+<div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
+    <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
+</div>
+""")
+
+_STATS_TMPL = _minify("""
+<div style="border: 2px solid #333; border-radius: 10px; padding: 10px; width: 300px; background-color: #f0f0f0; font-family: Arial, sans-serif;">
+    <h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>
+    {bars}
+</div>
+""")
+
+_BAR_TMPL = _minify("""
+<div style="margin-bottom: 5px;">
+    <strong>{label}:</strong> {value}/100
+    <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
+        <div style="background-color: {color}; width: {width}%; height: 100%; border-radius: 5px;"></div>
+    </div>
+</div>
+""")
+
+_SAY_TMPL = _minify("""
+<div style="display: flex; align-items: center; margin-bottom: 10px;">
+    <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
+    <div style="background-color: #fff; border: 2px solid #333; border-radius: 15px; padding: 8px 15px;">
+        {message}
+    </div>
+</div>
+""")
+
+_LABEL_TMPL = _minify("""
+<div style="background-color: #FFEB3B; padding: 5px 15px; border-radius: 15px; border: 3px solid #FBC02D; display: inline-block; font-weight: bold;">
+    Hello, my name is {name}
+</div>
+""")
+
+_SCENE_TMPL = _minify("""
+<div style="display: flex; flex-direction: column; align-items: flex-start; gap: 5px;">
+    {content}
+</div>
+""")
+
 # ==========================================
 # Utility Functions (工具函式)
 # ==========================================
@@ -49,128 +145,227 @@ def get_version() -> str:
 
 def _get_img_path(filename: str) -> Optional[str]:
     """Helper to get full path and verify existence."""
-    path = os.path.join(ASSETS_DIR, filename)
+    cached = _PATH_CACHE.get(filename)
+    if cached is not None:
+        return cached
+    path = _ASSET_PATHS.get(filename) or os.path.join(ASSETS_DIR, filename)
     if not os.path.exists(path):
         # Fallback for when current directory is not root
         path = os.path.join("..", "..", ASSETS_DIR, filename) 
         if not os.path.exists(path):
             return None
+    _PATH_CACHE[filename] = path
     return path
 
-def _render_html(html_content: str):
-    """Internal helper to render HTML content safely."""
-    if MODE == "JUPYTER":
+def reset_asset_cache() -> None:
+    """
+    Forget resolved paths and encoded images.
+    Call this after replacing files in assets/images during a session.
+    """
+    _PATH_CACHE.clear()
+    _IMG_CACHE.clear()
+
+def _encode_img(path: str) -> str:
+    """Helper to read an image once and cache its base64 data URI."""
+    img_src = _IMG_CACHE.get(path)
+    if img_src is None:
+        mime = _IMG_MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/png")
+        with open(path, "rb") as f:
+            # Encode straight from the mapped file pages (no intermediate bytes copy);
+            # mmap refuses empty files, which simply encode to ""
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    encoded = binascii.b2a_base64(view, newline=False).decode("ascii")
+            else:
+                encoded = ""
+        img_src = f"data:{mime};base64,{encoded}"
+        _IMG_CACHE[path] = img_src
+    return img_src
+
+def _preload_assets():
+    """Helper to encode the built-in images once, at import time."""
+    for filename in IMAGE_FILES:
+        path = _get_img_path(filename)
+        if path:
+            try:
+                _encode_img(path)
+            except OSError:
+                pass
+
+if MODE == "JUPYTER":
+    _preload_assets()
+
+def _current_cell() -> Optional[int]:
+    """Helper to identify the running cell (IPython execution count, None outside a kernel)."""
+    ip = get_ipython()
+    return ip.execution_count if ip is not None else None
+
+def _update_display(key, obj):
+    """
+    Helper to show obj in the output registered under key.
+    The first call in a cell creates the output (display_id), later calls in
+    the same cell redraw it in place instead of appending another one.
+    """
+    cell = _current_cell()
+    entry = _DISPLAY_IDS.get(key)
+    if entry is not None and entry[0] == cell:
+        entry[1].update(obj)
+    else:
+        # Outside a kernel display() just prints obj and returns no handle, so
+        # there is nothing to redraw later: later calls display again instead
+        handle = display(obj, display_id=True)
+        if handle is not None:
+            _DISPLAY_IDS[key] = (cell, handle)
+        else:
+            _DISPLAY_IDS.pop(key, None)
+
+def _render_html_terminal(html_content: str, update_key: Optional[str] = None):
+    pass
+
+@_dispatch(_render_html_terminal)
+def _render_html(html_content: str, update_key: Optional[str] = None):
+    """Internal helper to render HTML content safely (update_key: see _update_display)."""
+    _ensure_ipython()
+    if update_key is None:
         display(HTML(html_content))
     else:
-        pass
+        _update_display(update_key, HTML(html_content))
+
+# Bar colors by decile (value // 10 for 0-100): red below 20, orange below 50, green otherwise
+_BAR_COLORS = ("#ff4444",) * 2 + ("#ffbb33",) * 3 + ("#00C851",) * 6
 
 def _get_bar_color(value: int) -> str:
-    """決定狀態條的顏色"""
-    if value < 20: return "#ff4444" # Red
-    if value < 50: return "#ffbb33" # Orange
-    return "#00C851" # Green
+    """決定狀態條的顏色 (value 需已限制在 0-100)"""
+    return _BAR_COLORS[int(value) // 10]
 
 # ==========================================
 # Core Functions (核心功能)
 # ==========================================
 
-def show_image(filename: str, width: int = 200):
-    """顯示原始圖片檔案"""
-    if MODE == "TERMINAL":
-        print(f"[IMAGE] {filename}")
-        return
-
+def _image_html(filename: str, width: int = 200) -> str:
+    """Helper to build the boxed <img> HTML ("" if the image can't be loaded)."""
     path = _get_img_path(filename)
     if not path:
-        return
+        return ""
 
     try:
-        with open(path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
-        img_src = f"data:image/png;base64,{encoded}"
+        img_src = _encode_img(path)
     except Exception as e:
         print(f"Error loading image: {e}")
-        return
+        return ""
 
-    html = f"""
-    <div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
-        <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
-    </div>
-    """
-    _render_html(html)
+    return _IMAGE_TMPL.format(width=width, img_src=img_src)
 
-def show_pet(mood: str = "normal"):
-    """顯示寵物表情 (happy, sad, normal)"""
-    if MODE == "TERMINAL":
-        print(f"(^.{mood}.^) [Pet is {mood}]")
-        return
-    filename = f"{mood}.png"
-    show_image(filename)
+def _show_image_terminal(filename: str, width: int = 200, mode: str = "box"):
+    print(f"[IMAGE] {filename}")
 
-def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None):
-    """(v1.0 Compatible) Render a beautiful HTML stat bar."""
-    if MODE == "TERMINAL":
-        print(f"--- {name} ---")
-        print(f"HP: {hp}/100")
-        print(f"Hunger: {hunger}/100")
-        if happiness is not None:
-            print(f"Happy: {happiness}/100")
+@_dispatch(_show_image_terminal)
+def show_image(filename: str, width: int = 200, mode: str = "box"):
+    """
+    顯示原始圖片檔案
+    mode="box": 置中於正方形 HTML 框內；mode="raw": 直接用 Image 輸出 (不經過 base64 HTML)
+    """
+    if mode == "raw":
+        path = _get_img_path(filename)
+        if path:
+            _ensure_ipython()
+            display(Image(filename=path, width=width))
         return
-    
+
+    html = _image_html(filename, width)
+    if html:
+        _render_html(html)
+
+def _show_pet_terminal(mood: str = "normal", update: bool = False):
+    print(f"(^.{mood}.^) [Pet is {mood}]")
+
+@_dispatch(_show_pet_terminal)
+def show_pet(mood: str = "normal", update: bool = False):
+    """
+    顯示寵物表情 (happy, sad, normal)
+    update=True 時重畫本 cell 上一次的寵物，而不是再新增一張。
+    """
+    html = _image_html(f"{mood}.png")
+    if html:
+        _render_html(html, "pet" if update else None)
+
+def _stats_html(name: str, hp: int, hunger: int, happiness: Optional[int] = None) -> str:
+    """Helper to build the stat panel HTML (used by show_stats and show_scene)."""
     def _create_bar_html(label, value, reverse_color=False):
         # For hunger: higher value = more hungry = red (reverse logic)
-        color_value = (100 - value) if reverse_color else value
-        color = _get_bar_color(color_value)
-        return f"""
-        <div style="margin-bottom: 5px;">
-            <strong>{label}:</strong> {value}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="background-color: {color}; width: {min(value, 100)}%; height: 100%; border-radius: 5px;"></div>
-            </div>
-        </div>
-        """
-
-    content_html = f"""<h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>"""
-    content_html += _create_bar_html("HP", hp)
-    content_html += _create_bar_html("Hunger", hunger, reverse_color=True)
+        # Clamp to 0-100 once; the clamped value drives both width and color
+        pct = max(0, min(100, value))
+        color = _get_bar_color((100 - pct) if reverse_color else pct)
+        return _BAR_TMPL.format(label=label, value=value, color=color, width=pct)
+
+    bars_html = _create_bar_html("HP", hp)
+    bars_html += _create_bar_html("Hunger", hunger, reverse_color=True)
     
     if happiness is not None:
-        content_html += _create_bar_html("Happiness", happiness)
+        bars_html += _create_bar_html("Happiness", happiness)
 
-    container_html = f"""
-    <div style="border: 2px solid #333; border-radius: 10px; padding: 10px; width: 300px; background-color: #f0f0f0; font-family: Arial, sans-serif;">
-        {content_html}
-    </div>
-    """
-    _render_html(container_html)
+    return _STATS_TMPL.format(name=name, bars=bars_html)
+
+def _show_stats_terminal(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+                         update: bool = False):
+    print(f"--- {name} ---")
+    print(f"HP: {hp}/100")
+    print(f"Hunger: {hunger}/100")
+    if happiness is not None:
+        print(f"Happy: {happiness}/100")
 
+@_dispatch(_show_stats_terminal)
+def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+               update: bool = False):
+    """(v1.0 Compatible) Render a beautiful HTML stat bar."""
+    _render_html(_stats_html(name, hp, hunger, happiness), "stats" if update else None)
+
+def _say_html(name: str, message: str) -> str:
+    """Helper to build the speech bubble HTML."""
+    return _SAY_TMPL.format(name=name, message=message)
+
+def _say_terminal(name: str, message: str):
+    print(f"{name}: {message}")
+
+@_dispatch(_say_terminal)
 def say(name: str, message: str):
     """Render a speech bubble."""
-    if MODE == "TERMINAL":
-        print(f"{name}: {message}")
-        return
+    _render_html(_say_html(name, message))
 
-    html = f"""
-    <div style="display: flex; align-items: center; margin-bottom: 10px;">
-        <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
-        <div style="background-color: #fff; border: 2px solid #333; border-radius: 15px; padding: 8px 15px;">
-            {message}
-        </div>
-    </div>
-    """
-    _render_html(html)
+def _label_html(name: str) -> str:
+    """Helper to build the name tag HTML."""
+    return _LABEL_TMPL.format(name=name)
+
+def _set_label_terminal(name: str, update: bool = False):
+    print(f"[LABEL] Assigned Name: {name}")
 
-def set_label(name: str):
+@_dispatch(_set_label_terminal)
+def set_label(name: str, update: bool = False):
     """Visualizes a name tag."""
-    if MODE == "TERMINAL":
-        print(f"[LABEL] Assigned Name: {name}")
-        return
-    html = f"""
-    <div style="background-color: #FFEB3B; padding: 5px 15px; border-radius: 15px; border: 3px solid #FBC02D; display: inline-block; font-weight: bold;">
-        Hello, my name is {name}
-    </div>
+    _render_html(_label_html(name), "label" if update else None)
+
+def _show_scene_terminal(name: str, mood: str, hp: int, hunger: int,
+                         happiness: Optional[int] = None, message: Optional[str] = None,
+                         update: bool = False):
+    set_label(name)
+    show_pet(mood)
+    show_stats(name, hp, hunger, happiness)
+    if message is not None:
+        say(name, message)
+
+@_dispatch(_show_scene_terminal)
+def show_scene(name: str, mood: str, hp: int, hunger: int,
+               happiness: Optional[int] = None, message: Optional[str] = None,
+               update: bool = False):
+    """
+    一次顯示名牌、寵物表情、狀態條 (以及選擇性的對話氣泡)。
+    全部合併成單一 HTML 輸出，遊戲迴圈每回合只需一次 display。
+    update=True 時重畫本 cell 上一次的畫面 (display_id)，不會一路往下疊。
     """
-    _render_html(html)
+    content = _label_html(name) + _image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness)
+    if message is not None:
+        content += _say_html(name, message)
+    _render_html(_SCENE_TMPL.format(content=content), "scene" if update else None)
 
 # ==========================================
 # New Features v2.0 (Dictionaries)
@@ -190,16 +385,20 @@ def create_pet(name: str, hp: int = 100, hunger: int = 50, mood: str = "normal",
     Returns:
         包含寵物資料的字典
     """
-    pet_data = {
+    return {
         "name": name,
         "hp": hp,
         "hunger": hunger,
-        "mood": mood
+        "mood": mood,
+        **kwargs  # 加入額外的屬性
     }
-    # 加入額外的屬性
-    pet_data.update(kwargs)
-    return pet_data
 
+def _show_pet_dict_terminal(pet_data: Dict[str, Any]):
+    g = pet_data.get
+    show_pet(g('mood', 'normal'))
+    show_stats(g('name', 'Unknown'), g('hp', 0), g('hunger', 0), g('happiness', None))
+
+@_dispatch(_show_pet_dict_terminal)
 def show_pet_dict(pet_data: Dict[str, Any]):
     """
     (v2.0 New) 顯示寵物狀態，支援傳入 Dictionary。
@@ -211,21 +410,25 @@ def show_pet_dict(pet_data: Dict[str, Any]):
     happiness = pet_data.get('happiness', None) # Optional
     mood = pet_data.get('mood', 'normal')
 
-    # 1. 顯示表情
-    show_pet(mood)
-
-    # 2. 顯示數值
-    show_stats(name, hp, hunger, happiness)
+    # 表情 + 數值合併成一次輸出 (只送一則 display 訊息給瀏覽器)
+    _render_html(_image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness))
 
 def save_pet(pet_data: Dict[str, Any], filename: str = "save.json"):
     """
     (v2.0 New) 將寵物字典儲存為 JSON 檔案。
+    先寫到暫存檔再整個換上去，存到一半當掉也不會留下壞掉的存檔。
     """
+    tmp_path = filename + ".tmp"
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(pet_data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
         print(f"✅ 寵物資料已儲存到 {filename}")
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         print(f"❌ 儲存失敗: {e}")
 
 def load_pet(filename: str = "save.json") -> Optional[Dict[str, Any]]:
@@ -18,6 +18,7 @@ Cyber-Pet Library - 視覺化電子雞工具庫 (v5.0)
 - show_battle_log: (v3.0) 顯示戰鬥日誌
 - create_pet: (v2.0) 創建寵物字典
 - show_pet_dict: (v2.0) 顯示寵物
+- show_scene: (v2.0) 名牌、表情、數值、對話一次輸出
 - save_pet/load_pet: (v2.0) 檔案存取
 
 Changelog:
@@ -33,28 +34,83 @@ __version__ = "5.0.0"
 __author__ = "Cyber-Pet Course Team"
 
 import os
+import re
+import sys
 import base64
+import collections
+import functools
+import hashlib
+import html
+import importlib.util
+import itertools
 import json
 import time
-from typing import Optional, Union, Dict, Any, List
+from typing import Optional, Union, Dict, Any, List, Tuple, Iterable
+
+# 偵測 IPython 環境 (Jupyter Support)
+# Only check that IPython is installed; importing it (traitlets, etc.) is slow,
+# so the display API is loaded on the first render instead of at `import pet_lib`.
+# Terminal mode never reaches IPython: every output function is bound to its
+# text-only variant at import (see _dispatch), so no mock classes needed.
+MODE = "JUPYTER" if importlib.util.find_spec("IPython") is not None else "TERMINAL"
+display = HTML = Image = clear_output = Audio = get_ipython = None
+
+# 可選加速：有安裝 orjson 就用它讀寫存檔 (輸出格式相同)，否則用標準 json
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
 
-# 嘗試匯入 IPython 環境 (Jupyter Support)
 try:
-    from IPython.display import display, HTML, clear_output, Audio  # type: ignore
-    MODE = "JUPYTER"
+    import orjson  # type: ignore
+
+    def _dumps(obj: Any) -> bytes:
+        # orjson 不接受超過 64 位元的整數 (TypeError)，又會把 NaN/inf 默默寫成 null；
+        # 這兩種情況改用標準 json，存檔內容才和沒裝 orjson 時一樣
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return _json_dumps(obj)
+        return _json_dumps(obj) if b"null" in data else data
+
+    # 20 位以上的數字可能超過 64 位元，orjson 會把這種整數讀成 float
+    _LONG_NUMBER_RE = re.compile(rb"\d{20}")
+
+    def _loads(data: bytes) -> Any:
+        # 標準 json 寫出的 NaN/Infinity orjson 讀不了 (JSONDecodeError)，超大整數會失真，
+        # 都改用標準 json
+        if _LONG_NUMBER_RE.search(data):
+            return json.loads(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
 except ImportError:
-    MODE = "TERMINAL"
-    # Mock classes for Terminal fallback
-    def display(obj): pass 
-    def clear_output(wait=False): pass
-    class HTML:
-        def __init__(self, data): self.data = data
-    class Audio:
-        def __init__(self, *args, **kwargs): pass
+    _dumps = _json_dumps
+    _loads = json.loads
+
+# simulate_api 的 payload 顯示：一個共用的 encoder，中文照原樣、不加多餘空白
+_JSON_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+def _dispatch(terminal_impl):
+    """
+    Decorator: MODE never changes after import, so in TERMINAL mode the
+    decorated function is swapped for terminal_impl once, here, instead of
+    every call checking MODE first.
+    """
+    def decorate(func):
+        if MODE == "TERMINAL":
+            return functools.wraps(func)(terminal_impl)
+        return func
+    return decorate
 
 # Constants
 ASSETS_DIR = os.path.join("assets", "images")
 
+# 內建圖片 (與 setup.py 相同)，Jupyter 模式下 import 時就先編碼好
+IMAGE_FILES = ["egg.png", "happy.png", "sad.png", "normal.png", "poop.png"]
+
+# Pre-encoded built-in images: {filename: "data:image/png;base64,..."}
+_PRELOADED: Dict[str, str] = {}
+
 # Sound URLs (預設音效庫)
 SOUND_LIBRARY = {
     "attack": "https://commondatastorage.googleapis.com/codeskulptor-assets/Epoq-Lepidoptera.ogg",
@@ -65,6 +121,251 @@ SOUND_LIBRARY = {
     "heal": "https://commondatastorage.googleapis.com/codeskulptor-demos/riceracer_assets/fx/engine-1.ogg"
 }
 
+# Audio objects built by play_sound, reused on every replay: {sound_name: Audio}
+_AUDIO_CACHE: Dict[str, Any] = {}
+
+# ==========================================
+# HTML Templates (只建立一次，每次呼叫用 str.format 填值)
+# ==========================================
+
+_IMAGE_TMPL = """
+<div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
+    <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
+</div>
+"""
+
+_STATS_TMPL = """
+<div style="border: 2px solid #333; border-radius: 10px; padding: 10px; width: 300px; background-color: #f0f0f0; font-family: Arial, sans-serif;">
+    <h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>
+    {bars}
+</div>
+"""
+
+_BAR_TMPL = """
+<div style="margin-bottom: 5px;">
+    <strong>{label}:</strong> {value}/100
+    <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
+        <div style="background-color: {color}; width: {width}%; height: 100%; border-radius: 5px;"></div>
+    </div>
+</div>
+"""
+
+_SAY_TMPL = """
+<div style="display: flex; align-items: center; margin-bottom: 10px;">
+    <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
+    <div style="background-color: #fff; border: 2px solid #333; border-radius: 15px; padding: 8px 15px;">
+        {message}
+    </div>
+</div>
+"""
+
+_LABEL_TMPL = """
+<div style="background-color: #FFEB3B; padding: 5px 15px; border-radius: 15px; border: 3px solid #FBC02D; display: inline-block; font-weight: bold;">
+    Hello, my name is {name}
+</div>
+"""
+
+_SCENE_TMPL = """
+<div style="display: flex; flex-direction: column; align-items: flex-start; gap: 5px;">
+    {content}
+</div>
+"""
+
+_HUD_TMPL = """
+<div style="background: rgba(0,0,0,0.8); color: white; padding: 10px; border-radius: 10px; display: flex; justify-content: space-between; align-items: center; width: 100%; max-width: 600px;">
+    <div style="font-weight: bold; font-size: 1.2em;">👤 {name}</div>
+    <div style="flex-grow: 1; margin: 0 20px;">
+        <div style="background: #333; height: 15px; border-radius: 10px; overflow: hidden;">
+            <div style="background: {hp_color}; width: 100%; height: 100%; transform: scaleX({hp_frac}); transform-origin: left;"></div>
+        </div>
+        <div style="font-size: 0.8em; text-align: center;">HP: {hp}/{max_hp}</div>
+    </div>
+    <div style="color: gold;">💰 {gold} G</div>
+</div>
+"""
+
+_CARD_IMG_TMPL = '<img src="{img_src}" style="height: 80px; width: 80px; object-fit: contain;">'
+_CARD_NO_IMG_TMPL = '<div style="height: 80px; width: 80px; background: #ccc; display: flex; align-items: center; justify-content: center;">{mood}</div>'
+
+_CARD_TMPL = """
+<div style="border: {border}; background: {bg}; border-radius: 10px; padding: 10px; width: 45%; display: flex; align-items: center;">
+    <div style="margin-right: 15px;">{img_tag}</div>
+    <div style="width: 100%;">
+        <div style="font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">{name}</div>
+        <div style="background: #444; height: 10px; border-radius: 5px; width: 100%; overflow: hidden;">
+            <div style="background: {hp_color}; width: 100%; height: 100%; transform: scaleX({hp_frac}); transform-origin: left;"></div>
+        </div>
+        <div style="font-size: 0.8em; margin-top: 2px;">HP: {hp}/{max_hp}</div>
+    </div>
+</div>
+"""
+
+_LOG_ROW_TMPL = '<div style="border-bottom: 1px solid #eee; padding: 4px;">{msg}</div>'
+
+_DASHBOARD_TMPL = """
+<div style="font-family: Arial, sans-serif; max-width: 600px; border: 1px solid #ccc; padding: 10px; border-radius: 10px; background: #fff;">
+    <div style="display: flex; justify-content: space-between; margin-bottom: 15px;">
+        {player_card}
+        {enemy_card}
+    </div>
+    <div style="background: #f9f9f9; padding: 10px; border-radius: 5px; height: 120px; overflow-y: auto; font-size: 0.9em;">
+        <strong>📜 Battle Log</strong>
+        {log_html}
+    </div>
+</div>
+"""
+
+_BATTLE_LOG_TMPL = """
+<div style="font-family: Arial, sans-serif; max-width: 600px; border: 2px solid #333; padding: 10px; border-radius: 10px; background: #f9f9f9;">
+    <div style="font-weight: bold; margin-bottom: 10px;">📜 Battle Log</div>
+    <div style="background: #fff; padding: 10px; border-radius: 5px; height: 150px; overflow-y: auto; font-size: 0.9em;">
+        {log_html}
+    </div>
+</div>
+"""
+
+# Player/enemy variants of the card, so _create_card has no per-side branches
+_PLAYER_CARD_TMPL = _CARD_TMPL.replace("{border}", "2px solid #00C851").replace(
+    "{bg}", "rgba(0, 50, 0, 0.1)").replace("{hp_color}", "#00C851")
+_ENEMY_CARD_TMPL = _CARD_TMPL.replace("{border}", "2px solid #ff4444").replace(
+    "{bg}", "rgba(50, 0, 0, 0.1)").replace("{hp_color}", "#ff4444")
+
+# AI 對話氣泡的底色 (style -> color)；使用者氣泡固定 WhatsApp green
+_BUBBLE_COLORS = {
+    "normal": "#E8E8E8",  # Gray
+    "cute": "#FFE5F0",    # Pink
+    "tech": "#E3F2FD",    # Light blue
+    "evil": "#FFEBEE",    # Light red
+}
+
+_CHAT_BUBBLE_USER_TMPL = """
+<div style="display: flex; flex-direction: column; align-items: flex-end; margin-bottom: 10px;">
+    <div style="font-size: 0.8em; color: #666; margin-bottom: 2px; margin-right: 5px;">{speaker}</div>
+    <div style="
+        background-color: #DCF8C6; 
+        padding: 8px 12px; 
+        border-radius: 15px; 
+        max-width: 70%; 
+        box-shadow: 1px 1px 2px rgba(0,0,0,0.1);
+        margin-left: auto;
+        margin-right: 0;
+        position: relative;
+    ">
+        {message}
+    </div>
+</div>
+"""
+
+_CHAT_BUBBLE_AI_TMPL = """
+<div style="display: flex; flex-direction: column; align-items: flex-start; margin-bottom: 10px;">
+    <div style="font-size: 0.8em; color: #666; margin-bottom: 2px; margin-left: 5px;">{speaker}</div>
+    <div style="
+        background-color: {bg_color}; 
+        padding: 8px 12px; 
+        border-radius: 15px; 
+        max-width: 70%; 
+        box-shadow: 1px 1px 2px rgba(0,0,0,0.1);
+        margin-left: 0;
+        margin-right: auto;
+        position: relative;
+    ">
+        {message}
+    </div>
+</div>
+"""
+
+_THINKING_TMPL = """
+<div style="display: flex; align-items: center; color: #888; margin-bottom: 10px;">
+    <span style="margin-right: 10px;">🧠 {prompt}</span>
+    <div style="
+        width: 10px; height: 10px; background: #888; border-radius: 50%; 
+        animation: pulse 1s infinite;"></div>
+</div>
+<style>
+@keyframes pulse {{
+    0%, 100% {{ opacity: 0.3; }}
+    50% {{ opacity: 1; }}
+}}
+</style>
+"""
+
+_MINDSET_TMPL = """
+<div style="
+    border: 2px dashed #9C27B0; 
+    background: #F3E5F5; 
+    padding: 10px; 
+    border-radius: 8px; 
+    color: #4A148C; 
+    margin-bottom: 10px;
+">
+    <strong>🧠 System Mindset Loaded:</strong><br>
+    <em>"{personality_text}"</em>
+</div>
+"""
+
+# celebrate() 的畫面完全固定，直接當常數
+_CELEBRATE_HTML = """
+<div style="text-align: center; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 15px; color: white; font-family: Arial, sans-serif;">
+    <div style="font-size: 3em; margin-bottom: 10px;">🎉</div>
+    <div style="font-size: 2em; font-weight: bold; margin-bottom: 10px;">CONGRATULATIONS!</div>
+    <div style="font-size: 1.2em;">You did it! 🎊</div>
+    <div style="margin-top: 20px; font-size: 4em;">
+        🏆
+    </div>
+</div>
+"""
+# 連 HTML 物件也只建一次 (第一次 celebrate() 時)，之後直接 display
+_CELEBRATE_HTML_OBJ = None
+
+_CREDITS_TMPL = """
+<div style="
+    background: linear-gradient(to bottom, #1a1a2e, #16213e); 
+    color: #eee; 
+    padding: 30px; 
+    border-radius: 10px; 
+    font-family: 'Courier New', monospace;
+    text-align: center;
+    max-width: 500px;
+    margin: 0 auto;
+">
+    <div style="font-size: 2em; margin-bottom: 20px; color: #ffd700;">✨ CREDITS ✨</div>
+    <div style="font-size: 1.2em; line-height: 2em;">
+        <div style="margin: 10px 0;"><strong>Director:</strong> {author_name}</div>
+        <div style="margin: 10px 0;"><strong>Art:</strong> Ys the Cat 🐱</div>
+        <div style="margin: 10px 0;"><strong>Engine:</strong> Python 3 🐍</div>
+        <div style="margin: 10px 0;"><strong>Library:</strong> pet_lib v5.0</div>
+        <div style="margin: 10px 0;"><strong>Based on:</strong> Cyber-Pet Course</div>
+    </div>
+    <div style="margin-top: 30px; font-size: 1.5em; color: #ffd700;">
+        THANK YOU FOR PLAYING!
+    </div>
+    <div style="margin-top: 20px; font-size: 2em;">
+        🎮 🎯 🎨
+    </div>
+</div>
+"""
+# 只有 author_name 會變：先在佔位符處切成前後兩段，呼叫時直接接起來
+_CREDITS_PREFIX, _, _CREDITS_SUFFIX = _CREDITS_TMPL.partition("{author_name}")
+
+_SOUND_PRELOAD_TMPL = '<audio preload="auto" src="{url}" style="display: none;"></audio>'
+
+# show_animation: 所有影格一次送出，由瀏覽器用 CSS 依序顯示 (每張圖只送一份)
+_ANIM_TMPL = """
+<style>
+@keyframes pet-anim-frame {{ from, to {{ visibility: visible; }} }}
+{frame_css}
+</style>
+<div style="display: grid; width: 200px; min-height: 200px; justify-items: center; align-items: center;">
+    {frames}
+</div>
+"""
+
+_ANIM_FRAME_CSS_TMPL = '.{css_class} {{ background: url("{img_src}") center / contain no-repeat; }}'
+
+_ANIM_IMG_FRAME_TMPL = '<div class="{css_class}" style="grid-area: 1 / 1; width: 200px; height: 200px; visibility: hidden; animation: pet-anim-frame {duration:g}s {start:g}s{fill};"></div>'
+
+_ANIM_TEXT_FRAME_TMPL = '<div style="grid-area: 1 / 1; font-family: monospace; white-space: pre; visibility: hidden; animation: pet-anim-frame {duration:g}s {start:g}s{fill};">{text}</div>'
+
 # ==========================================
 # Utility Functions (工具函式)
 # ==========================================
@@ -73,8 +374,36 @@ def get_version() -> str:
     """取得當前 pet_lib 版本"""
     return __version__
 
+@functools.lru_cache(maxsize=1)
+def _asset_index() -> Dict[str, str]:
+    """Helper to list the image folder(s) once: {filename: path}."""
+    index: Dict[str, str] = {}
+    for root in (ASSETS_DIR, os.path.join("..", "..", ASSETS_DIR)):
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        index.setdefault(entry.name, entry.path)
+        except OSError:
+            pass
+    return index
+
+# Text made only of these characters needs no HTML escaping (\w covers CJK names too)
+_SAFE_TEXT_RE = re.compile(r"[\w .,!?:/'-]*")
+
+def _esc(value: Any) -> str:
+    """Helper to HTML-escape user text for the templates (plain names/messages skip html.escape)."""
+    text = value if type(value) is str else str(value)
+    if _SAFE_TEXT_RE.fullmatch(text):
+        return text
+    return html.escape(text, quote=False)
+
 def _get_img_path(filename: str) -> Optional[str]:
     """Helper to get full path and verify existence."""
+    path = _asset_index().get(filename)
+    if path:
+        return path
+    # Not in the cached listing (sub-folder path, or added after import)
     path = os.path.join(ASSETS_DIR, filename)
     if not os.path.exists(path):
         # Fallback for when current directory is not root
@@ -83,120 +412,298 @@ def _get_img_path(filename: str) -> Optional[str]:
             return None
     return path
 
-def _render_html(html_content: str):
-    """Internal helper to render HTML content safely."""
-    if MODE == "JUPYTER":
+@functools.lru_cache(maxsize=32)
+def _encode_img(path: str) -> str:
+    """Helper to read an image once and cache its base64 data URI (keyed by path)."""
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return f"data:image/png;base64,{encoded}"
+
+def _img_data_uri(filename: str) -> Optional[str]:
+    """
+    取得圖片的 base64 data URI (None 表示找不到檔案)。
+    編碼結果會快取，動畫或儀表板重繪時不必再讀檔、再編碼。
+    找不到的檔案不快取，之後補跑 setup.py 仍然有效。
+    """
+    img_src = _PRELOADED.get(filename)
+    if img_src is not None:
+        return img_src
+    path = _get_img_path(filename)
+    if not path:
+        return None
+    return _encode_img(path)
+
+def reset_asset_cache() -> None:
+    """清除圖片快取 (在執行期間替換了 assets/images 裡的檔案時使用)。"""
+    _PRELOADED.clear()
+    _asset_index.cache_clear()
+    _encode_img.cache_clear()
+    _card_img_tag.cache_clear()
+    _frame_css.cache_clear()
+
+@functools.lru_cache(maxsize=32)
+def _frame_css(img_src: str) -> Tuple[str, str]:
+    """
+    Helper to build an animation frame's (CSS class, CSS rule) once per image.
+    The class is named after the image content, so the same image always gets the same class.
+    """
+    css_class = "pet-frame-" + hashlib.sha1(img_src.encode("ascii")).hexdigest()[:12]
+    return css_class, _ANIM_FRAME_CSS_TMPL.format(css_class=css_class, img_src=img_src)
+
+def _preload_assets():
+    """Helper to encode the built-in images once, at import time (no disk hit on the first frame)."""
+    for filename in IMAGE_FILES:
+        try:
+            img_src = _img_data_uri(filename)
+        except OSError:
+            continue
+        if img_src:
+            _PRELOADED[filename] = img_src
+
+if MODE == "JUPYTER":
+    _preload_assets()
+
+def _ensure_ipython() -> None:
+    """Helper to import IPython's display API once, on first use."""
+    global display, HTML, Image, clear_output, Audio, get_ipython
+    if display is None:
+        from IPython.display import display, HTML, Image, clear_output, Audio  # type: ignore
+        from IPython import get_ipython  # type: ignore
+
+# Last HTML drawn per slot: {slot: (cell execution count, html)}
+_LAST_HTML: Dict[str, Tuple[Optional[int], str]] = {}
+
+# Outputs re-drawn by update=True: {key: (cell execution count, DisplayHandle)}
+_DISPLAY_IDS: Dict[str, Tuple[Optional[int], Any]] = {}
+
+def _current_cell() -> Optional[int]:
+    """Helper to identify the running cell (IPython execution count, None outside a kernel)."""
+    ip = get_ipython()
+    return ip.execution_count if ip is not None else None
+
+def _update_display(key: str, obj: Any):
+    """
+    Helper to show obj in the output registered under key.
+    The first call in a cell creates the output (display_id), later calls in
+    the same cell redraw it in place instead of appending another one.
+    """
+    cell = _current_cell()
+    entry = _DISPLAY_IDS.get(key)
+    if entry is not None and entry[0] == cell:
+        entry[1].update(obj)
+    else:
+        # Outside a kernel display() just prints obj and returns no handle, so
+        # there is nothing to redraw later: later calls display again instead
+        handle = display(obj, display_id=True)
+        if handle is not None:
+            _DISPLAY_IDS[key] = (cell, handle)
+        else:
+            _DISPLAY_IDS.pop(key, None)
+
+def invalidate_slot(slot: Optional[str] = None) -> None:
+    """
+    讓 slot ("hud", "dashboard") 下一次一定重新輸出；slot=None 表示全部。
+    自己呼叫 clear_output() 之後、又想用 skip_unchanged=True 時使用。
+    """
+    if slot is None:
+        _LAST_HTML.clear()
+    else:
+        _LAST_HTML.pop(slot, None)
+
+# HTML fragments collected inside `with BatchRenderer():` (None = not batching)
+_BATCH_BUF: Optional[List[str]] = None
+
+class BatchRenderer:
+    """
+    把一段程式碼裡所有的畫面合併成「一次」輸出。
+
+        with BatchRenderer():
+            render_hud(player)
+            show_dashboard(player, enemy, logs)
+            show_battle_log(logs)
+
+    區塊結束時才把 HUD、儀表板、戰鬥日誌等 HTML 串起來送出一則 display，
+    瀏覽器只需要處理一次。可以巢狀使用 (由最外層負責輸出)。
+    音效 (play_sound) 不經過這裡，仍會立刻播放。
+    """
+
+    def __enter__(self):
+        global _BATCH_BUF
+        self._outermost = _BATCH_BUF is None
+        if self._outermost:
+            _BATCH_BUF = []
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _BATCH_BUF
+        if self._outermost:
+            fragments, _BATCH_BUF = _BATCH_BUF, None
+            if fragments:
+                _render_html("".join(fragments))
+        return False
+
+def _clear_cell():
+    """Helper to clear the cell's output (also drops slot history, update=True handles and any batched, not-yet-shown HTML)."""
+    _ensure_ipython()
+    clear_output(wait=True)
+    invalidate_slot()
+    _DISPLAY_IDS.clear()
+    if _BATCH_BUF:
+        _BATCH_BUF.clear()
+
+def _render_html_terminal(html_content: str, slot: Optional[str] = None, update_key: Optional[str] = None):
+    pass
+
+@_dispatch(_render_html_terminal)
+def _render_html(html_content: str, slot: Optional[str] = None, update_key: Optional[str] = None):
+    """
+    Internal helper to render HTML content safely.
+    slot: 同一個 cell 裡，這個 slot 上一次輸出的 HTML 完全相同時就不再輸出。
+    update_key: 見 _update_display (重畫同一個輸出，而不是再新增一個)。
+    在 BatchRenderer 區塊內只先收集起來，區塊結束時一起輸出。
+    """
+    _ensure_ipython()
+    if slot is not None:
+        entry = (_current_cell(), html_content)
+        if _LAST_HTML.get(slot) == entry:
+            return
+        _LAST_HTML[slot] = entry
+    if _BATCH_BUF is not None:
+        _BATCH_BUF.append(html_content)
+        return
+    if update_key is None:
         display(HTML(html_content))
     else:
-        pass
+        _update_display(update_key, HTML(html_content))
+
+# Bar color for every value 0-100: Red below 20, Orange below 50, Green otherwise
+_BAR_COLORS = tuple("#ff4444" if v < 20 else "#ffbb33" if v < 50 else "#00C851" for v in range(101))
 
 def _get_bar_color(value: int) -> str:
-    """決定狀態條的顏色"""
-    if value < 20: return "#ff4444" # Red
-    if value < 50: return "#ffbb33" # Orange
-    return "#00C851" # Green
+    """決定狀態條的顏色 (超出 0-100 的值當成 0 或 100)"""
+    return _BAR_COLORS[min(max(int(value), 0), 100)]
 
 # ==========================================
 # Core Functions (v1.0)
 # ==========================================
 
-def show_image(filename: str, width: int = 200):
-    """顯示原始圖片檔案"""
-    if MODE == "TERMINAL":
-        print(f"[IMAGE] {filename}")
-        return
-
-    path = _get_img_path(filename)
-    if not path:
-        return
-
+def _image_html(filename: str, width: int = 200) -> str:
+    """Helper to build the boxed <img> HTML ("" if the image can't be loaded)."""
     try:
-        with open(path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
-        img_src = f"data:image/png;base64,{encoded}"
+        img_src = _img_data_uri(filename)
     except Exception as e:
         print(f"Error loading image: {e}")
+        return ""
+    if not img_src:
+        return ""
+
+    return _IMAGE_TMPL.format(width=width, img_src=img_src)
+
+def _show_image_terminal(filename: str, width: int = 200, mode: str = "box"):
+    print(f"[IMAGE] {filename}")
+
+@_dispatch(_show_image_terminal)
+def show_image(filename: str, width: int = 200, mode: str = "box"):
+    """
+    顯示原始圖片檔案
+    mode="box": 置中於正方形 HTML 框內；mode="raw": 直接用 Image 輸出 (不經過 base64 HTML，也不經過 BatchRenderer)
+    """
+    if mode == "raw":
+        path = _get_img_path(filename)
+        if path:
+            _ensure_ipython()
+            display(Image(filename=path, width=width))
         return
 
-    html = f"""
-    <div style="display: flex; justify-content: center; align-items: center; width: {width}px; height: {width}px; overflow: hidden;">
-        <img src="{img_src}" style="max-width: 100%; max-height: 100%; object-fit: contain;">
-    </div>
+    html = _image_html(filename, width)
+    if html:
+        _render_html(html)
+
+def _show_pet_terminal(mood: str = "normal", update: bool = False):
+    print(f"(^.{mood}.^) [Pet is {mood}]")
+
+@_dispatch(_show_pet_terminal)
+def show_pet(mood: str = "normal", update: bool = False):
     """
-    _render_html(html)
+    顯示寵物表情 (happy, sad, normal)
+    update=True 時重畫本 cell 上一次的寵物，而不是再新增一張。
+    """
+    html = _image_html(f"{mood}.png")
+    if html:
+        _render_html(html, update_key="pet" if update else None)
 
-def show_pet(mood: str = "normal"):
-    """顯示寵物表情 (happy, sad, normal)"""
-    if MODE == "TERMINAL":
-        print(f"(^.{mood}.^) [Pet is {mood}]")
-        return
-    filename = f"{mood}.png"
-    show_image(filename)
+# typed=True: 50 and 50.0 print differently ("50/100" vs "50.0/100"), so keep them apart
+@functools.lru_cache(maxsize=512, typed=True)
+def _create_bar_html(label: str, value: int, reverse_color: bool = False) -> str:
+    """Helper to build one stat bar (few labels x 0-100 values, so results are cached)."""
+    # For hunger: higher value = more hungry = red (reverse logic)
+    color_value = (100 - value) if reverse_color else value
+    color = _get_bar_color(color_value)
+    return _BAR_TMPL.format(label=label, value=value, color=color, width=min(value, 100))
 
-def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None):
-    """(v1.0 Compatible) Render a beautiful HTML stat bar."""
-    if MODE == "TERMINAL":
-        print(f"--- {name} ---")
-        print(f"HP: {hp}/100")
-        print(f"Hunger: {hunger}/100")
-        if happiness is not None:
-            print(f"Happy: {happiness}/100")
-        return
-    
-    def _create_bar_html(label, value, reverse_color=False):
-        # For hunger: higher value = more hungry = red (reverse logic)
-        color_value = (100 - value) if reverse_color else value
-        color = _get_bar_color(color_value)
-        return f"""
-        <div style="margin-bottom: 5px;">
-            <strong>{label}:</strong> {value}/100
-            <div style="background-color: #ddd; border-radius: 5px; height: 10px; width: 100%;">
-                <div style="background-color: {color}; width: {min(value, 100)}%; height: 100%; border-radius: 5px;"></div>
-            </div>
-        </div>
-        """
+def _stats_html(name: str, hp: int, hunger: int, happiness: Optional[int] = None) -> str:
+    """Helper to build the stat panel HTML (used by show_stats, show_scene and show_pet_dict)."""
+    # 收集片段最後一次 join，避免每段 += 都重新配置整個字串
+    parts = [
+        _create_bar_html("HP", hp),
+        _create_bar_html("Hunger", hunger, reverse_color=True),
+    ]
+    if happiness is not None:
+        parts.append(_create_bar_html("Happiness", happiness))
+    return _STATS_TMPL.format(name=_esc(name), bars="".join(parts))
 
-    content_html = f"""<h3 style="margin: 0 0 10px 0; text-align: center;">🍱 {name}</h3>"""
-    content_html += _create_bar_html("HP", hp)
-    content_html += _create_bar_html("Hunger", hunger, reverse_color=True)
-    
+def _show_stats_terminal(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+                         update: bool = False):
+    # 整段文字一次寫出 (一次 write 取代好幾個 print)
+    lines = [f"--- {name} ---", f"HP: {hp}/100", f"Hunger: {hunger}/100"]
     if happiness is not None:
-        content_html += _create_bar_html("Happiness", happiness)
+        lines.append(f"Happy: {happiness}/100")
+    sys.stdout.write("\n".join(lines) + "\n")
 
-    container_html = f"""
-    <div style="border: 2px solid #333; border-radius: 10px; padding: 10px; width: 300px; background-color: #f0f0f0; font-family: Arial, sans-serif;">
-        {content_html}
-    </div>
-    """
-    _render_html(container_html)
+@_dispatch(_show_stats_terminal)
+def show_stats(name: str, hp: int, hunger: int, happiness: Optional[int] = None,
+               update: bool = False):
+    """(v1.0 Compatible) Render a beautiful HTML stat bar."""
+    _render_html(_stats_html(name, hp, hunger, happiness), update_key="stats" if update else None)
+
+def _say_terminal(name: str, message: str):
+    print(f"{name}: {message}")
 
+@_dispatch(_say_terminal)
 def say(name: str, message: str):
     """Render a speech bubble."""
-    if MODE == "TERMINAL":
-        print(f"{name}: {message}")
-        return
+    _render_html(_SAY_TMPL.format(name=_esc(name), message=_esc(message)))
 
-    html = f"""
-    <div style="display: flex; align-items: center; margin-bottom: 10px;">
-        <div style="font-weight: bold; margin-right: 10px;">{name}:</div>
-        <div style="background-color: #fff; border: 2px solid #333; border-radius: 15px; padding: 8px 15px;">
-            {message}
-        </div>
-    </div>
-    """
-    _render_html(html)
+def _set_label_terminal(name: str, update: bool = False):
+    print(f"[LABEL] Assigned Name: {name}")
 
-def set_label(name: str):
+@_dispatch(_set_label_terminal)
+def set_label(name: str, update: bool = False):
     """Visualizes a name tag."""
-    if MODE == "TERMINAL":
-        print(f"[LABEL] Assigned Name: {name}")
-        return
-    html = f"""
-    <div style="background-color: #FFEB3B; padding: 5px 15px; border-radius: 15px; border: 3px solid #FBC02D; display: inline-block; font-weight: bold;">
-        Hello, my name is {name}
-    </div>
+    _render_html(_LABEL_TMPL.format(name=_esc(name)), update_key="label" if update else None)
+
+def _show_scene_terminal(name: str, mood: str, hp: int, hunger: int,
+                         happiness: Optional[int] = None, message: Optional[str] = None,
+                         update: bool = False):
+    set_label(name)
+    show_pet(mood)
+    show_stats(name, hp, hunger, happiness)
+    if message is not None:
+        say(name, message)
+
+@_dispatch(_show_scene_terminal)
+def show_scene(name: str, mood: str, hp: int, hunger: int,
+               happiness: Optional[int] = None, message: Optional[str] = None,
+               update: bool = False):
     """
-    _render_html(html)
+    一次顯示名牌、寵物表情、狀態條 (以及選擇性的對話氣泡)。
+    全部合併成單一 HTML 輸出，遊戲迴圈每回合只需一次 display。
+    update=True 時重畫本 cell 上一次的畫面 (display_id)，不會一路往下疊。
+    """
+    content = _LABEL_TMPL.format(name=_esc(name)) + _image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness)
+    if message is not None:
+        content += _SAY_TMPL.format(name=_esc(name), message=_esc(message))
+    _render_html(_SCENE_TMPL.format(content=content), update_key="scene" if update else None)
 
 # ==========================================
 # v2.0 Features (Dictionaries)
@@ -216,42 +723,52 @@ def create_pet(name: str, hp: int = 100, hunger: int = 50, mood: str = "normal",
     Returns:
         包含寵物資料的字典
     """
-    pet_data = {
+    return {
         "name": name,
         "hp": hp,
         "hunger": hunger,
-        "mood": mood
+        "mood": mood,
+        **kwargs  # 加入額外的屬性
     }
-    # 加入額外的屬性
-    pet_data.update(kwargs)
-    return pet_data
 
+def _show_pet_dict_terminal(pet_data: Dict[str, Any]):
+    g = pet_data.get
+    show_pet(g('mood', 'normal'))
+    show_stats(g('name', 'Unknown'), g('hp', 0), g('hunger', 0), g('happiness', None))
+
+@_dispatch(_show_pet_dict_terminal)
 def show_pet_dict(pet_data: Dict[str, Any]):
     """
     (v2.0) 顯示寵物狀態，支援傳入 Dictionary。
     自動從字典中提取 'name', 'hp', 'hunger', 'happiness', 'mood' 等欄位。
     """
-    name = pet_data.get('name', 'Unknown')
-    hp = pet_data.get('hp', 0)
-    hunger = pet_data.get('hunger', 0)
-    happiness = pet_data.get('happiness', None) # Optional
-    mood = pet_data.get('mood', 'normal')
+    g = pet_data.get  # 綁定一次，省去每個欄位重複查 .get
+    name = g('name', 'Unknown')
+    hp = g('hp', 0)
+    hunger = g('hunger', 0)
+    happiness = g('happiness', None) # Optional
+    mood = g('mood', 'normal')
 
-    # 1. 顯示表情
-    show_pet(mood)
-
-    # 2. 顯示數值
-    show_stats(name, hp, hunger, happiness)
+    # 表情 + 數值合併成一次輸出 (只送一則 display 訊息給瀏覽器)
+    _render_html(_image_html(f"{mood}.png") + _stats_html(name, hp, hunger, happiness))
 
 def save_pet(pet_data: Dict[str, Any], filename: str = "save.json"):
     """
     (v2.0) 將寵物字典儲存為 JSON 檔案。
+    先寫到暫存檔再整個換上去，存到一半當掉也不會留下壞掉的存檔。
     """
+    tmp_path = filename + ".tmp"
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(pet_data, f, ensure_ascii=False, indent=2)
+        data = _dumps(pet_data)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
         print(f"✅ 寵物資料已儲存到 {filename}")
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         print(f"❌ 儲存失敗: {e}")
 
 def load_pet(filename: str = "save.json") -> Optional[Dict[str, Any]]:
@@ -259,8 +776,8 @@ def load_pet(filename: str = "save.json") -> Optional[Dict[str, Any]]:
     (v2.0) 從 JSON 檔案讀取寵物資料。
     """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(filename, 'rb') as f:
+            data = _loads(f.read())
         print(f"✅ 成功讀取 {filename}")
         return data
     except FileNotFoundError:
@@ -274,138 +791,142 @@ def load_pet(filename: str = "save.json") -> Optional[Dict[str, Any]]:
 # v3.0 Features (Rich UI, Animation, Sound)
 # ==========================================
 
-def render_hud(player: Dict[str, Any]):
+class BattleLog(collections.deque):
+    """
+    (v3.0) 戰鬥紀錄：只保留最新的 maxlen 筆，舊的自動丟掉。
+
+        logs = BattleLog()
+        logs.append("Pika used Thunder!")
+        show_dashboard(player, enemy, logs)
+
+    遊戲跑再久記憶體也不會一直變大；show_dashboard / show_battle_log
+    也可以照舊傳一般的 list。
+    """
+
+    def __init__(self, iterable: Iterable[str] = (), maxlen: int = 32):
+        super().__init__(iterable, maxlen)
+
+def _newest_first(logs: Iterable[str], n: int) -> List[str]:
+    """Helper to take the newest n log lines, newest first, without copying the whole log."""
+    if isinstance(logs, (list, tuple)):
+        return logs[:-n - 1:-1]
+    try:
+        # deque / BattleLog: walk back from the newest end
+        return list(itertools.islice(reversed(logs), n))
+    except TypeError:
+        # Any other iterable: keep only the last n while consuming it
+        tail = collections.deque(logs, maxlen=n)
+        tail.reverse()
+        return list(tail)
+
+def _render_hud_terminal(player: Dict[str, Any], skip_unchanged: bool = False):
+    g = player.get
+    sys.stdout.write(f"--- HUD ---\n"
+                     f"{g('name', 'Player')} | HP: {g('hp', 0)}/{g('max_hp', 100)} | Gold: {g('gold', 0)}\n")
+
+@_dispatch(_render_hud_terminal)
+def render_hud(player: Dict[str, Any], skip_unchanged: bool = False):
     """
     (v3.0) 顯示精簡的 HUD (Heads-Up Display)。
+    skip_unchanged=True: 同一個 cell 裡 HUD 內容沒變就不重複輸出 (見 invalidate_slot)。
     """
-    if MODE == "TERMINAL":
-        print(f"--- HUD ---")
-        print(f"{player.get('name', 'Player')} | HP: {player.get('hp', 0)}/{player.get('max_hp', 100)} | Gold: {player.get('gold', 0)}")
-        return
-        
-    name = player.get('name', 'Player')
-    hp = player.get('hp', 100)
-    max_hp = player.get('max_hp', 100)
-    gold = player.get('gold', 0)
+    g = player.get
+    name = g('name', 'Player')
+    hp = g('hp', 100)
+    max_hp = g('max_hp', 100)
+    gold = g('gold', 0)
     
-    hp_percent = min(100, max(0, int(hp / max_hp * 100)))
+    hp_percent = max(0, min(100, 100 * hp // max(1, max_hp)))
     hp_color = "#00C851" if hp_percent > 50 else "#ff4444"
 
-    html = f"""
-    <div style="background: rgba(0,0,0,0.8); color: white; padding: 10px; border-radius: 10px; display: flex; justify-content: space-between; align-items: center; width: 100%; max-width: 600px;">
-        <div style="font-weight: bold; font-size: 1.2em;">👤 {name}</div>
-        <div style="flex-grow: 1; margin: 0 20px;">
-            <div style="background: #333; height: 15px; border-radius: 10px; overflow: hidden;">
-                <div style="background: {hp_color}; width: {hp_percent}%; height: 100%;"></div>
-            </div>
-            <div style="font-size: 0.8em; text-align: center;">HP: {hp}/{max_hp}</div>
-        </div>
-        <div style="color: gold;">💰 {gold} G</div>
-    </div>
-    """
-    _render_html(html)
+    _render_html(_HUD_TMPL.format(name=_esc(name), hp_color=hp_color, hp_frac=hp_percent / 100,
+                                  hp=hp, max_hp=max_hp, gold=gold),
+                 "hud" if skip_unchanged else None)
+
+@functools.lru_cache(maxsize=16)
+def _card_img_tag(img_src: str) -> str:
+    """Helper to build a card's <img> tag once per image (player and enemy share it when moods match)."""
+    return _CARD_IMG_TMPL.format(img_src=img_src)
 
-def show_dashboard(player: Dict[str, Any], enemy: Optional[Dict[str, Any]] = None, logs: List[str] = []):
+def _create_card(entity: Dict[str, Any], is_enemy: bool = False) -> str:
+    """Helper to create stat card HTML (used by show_dashboard)."""
+    if not entity: return ""
+    g = entity.get
+    name = g('name', 'Unknown')
+    hp = g('hp', 100)
+    max_hp = g('max_hp', 100)
+    mood = g('mood', 'normal')
+
+    # Determine image (檔案在執行期間被刪除或改名時，退回文字方塊)
+    try:
+        img_src = _img_data_uri(f"{mood}.png")
+    except OSError:
+        img_src = None
+    if img_src:
+        img_tag = _card_img_tag(img_src)
+    else:
+        img_tag = _CARD_NO_IMG_TMPL.format(mood=_esc(mood))
+
+    hp_percent = max(0, min(100, 100 * hp // max(1, max_hp)))
+    tmpl = _ENEMY_CARD_TMPL if is_enemy else _PLAYER_CARD_TMPL
+    return tmpl.format(img_tag=img_tag, name=_esc(name), hp_frac=hp_percent / 100, hp=hp, max_hp=max_hp)
+
+def _show_dashboard_terminal(player: Dict[str, Any], enemy: Optional[Dict[str, Any]] = None, logs: Optional[Iterable[str]] = None,
+                             skip_unchanged: bool = False):
+    lines = ["--- DASHBOARD ---", f"Player: {player.get('name')} | HP: {player.get('hp')}"]
+    if enemy:
+        lines.append(f"Enemy: {enemy.get('name')} | HP: {enemy.get('hp')}")
+    lines.append("--- LOGS ---")
+    if logs:
+        lines.extend(f"> {log}" for log in reversed(_newest_first(logs, 3)))
+    sys.stdout.write("\n".join(lines) + "\n")
+
+@_dispatch(_show_dashboard_terminal)
+def show_dashboard(player: Dict[str, Any], enemy: Optional[Dict[str, Any]] = None, logs: Optional[Iterable[str]] = None,
+                   skip_unchanged: bool = False):
     """
     (v3.0) 顯示完整的戰鬥儀表板。
     包含：左側玩家狀態，右側敵人狀態 (如果有)，下方戰鬥紀錄。
+    skip_unchanged=True: 同一個 cell 裡儀表板內容沒變就不重複輸出 (見 invalidate_slot)。
     """
-    if MODE == "TERMINAL":
-        print(f"--- DASHBOARD ---")
-        print(f"Player: {player.get('name')} | HP: {player.get('hp')}")
-        if enemy:
-            print(f"Enemy: {enemy.get('name')} | HP: {enemy.get('hp')}")
-        print("--- LOGS ---")
-        for log in logs[-3:]:
-            print(f"> {log}")
-        return
-
-    # Helper to create stat card HTML
-    def _create_card(entity, is_enemy=False):
-        if not entity: return ""
-        name = entity.get('name', 'Unknown')
-        hp = entity.get('hp', 100)
-        max_hp = entity.get('max_hp', 100)
-        mood = entity.get('mood', 'normal')
-        
-        # Determine image
-        img_filename = f"{mood}.png"
-        img_path = _get_img_path(img_filename)
-        
-        img_tag = ""
-        if img_path:
-            with open(img_path, "rb") as f:
-                b64 = base64.b64encode(f.read()).decode("utf-8")
-            img_tag = f'<img src="data:image/png;base64,{b64}" style="height: 80px; width: 80px; object-fit: contain;">'
-        else:
-             img_tag = f'<div style="height: 80px; width: 80px; background: #ccc; display: flex; align-items: center; justify-content: center;">{mood}</div>'
-
-        hp_percent = int(hp / max_hp * 100) if max_hp > 0 else 0
-        hp_color = "#ff4444" if is_enemy else "#00C851"
-
-        border = "2px solid #ff4444" if is_enemy else "2px solid #00C851"
-        bg = "rgba(50, 0, 0, 0.1)" if is_enemy else "rgba(0, 50, 0, 0.1)"
-
-        return f"""
-        <div style="border: {border}; background: {bg}; border-radius: 10px; padding: 10px; width: 45%; display: flex; align-items: center;">
-            <div style="margin-right: 15px;">{img_tag}</div>
-            <div style="width: 100%;">
-                <div style="font-weight: bold; font-size: 1.1em; margin-bottom: 5px;">{name}</div>
-                <div style="background: #444; height: 10px; border-radius: 5px; width: 100%;">
-                    <div style="background: {hp_color}; width: {hp_percent}%; height: 100%; border-radius: 5px;"></div>
-                </div>
-                <div style="font-size: 0.8em; margin-top: 2px;">HP: {hp}/{max_hp}</div>
-            </div>
-        </div>
-        """
-
     player_card = _create_card(player, is_enemy=False)
     enemy_card = _create_card(enemy, is_enemy=True) if enemy else '<div style="width: 45%;"></div>'
 
-    # Logs Area
+    # Logs Area (沒有紀錄就留空，不用跑迴圈)
     log_html = ""
-    for msg in reversed(logs[-5:]): # Show last 5, newest on top
-        log_html += f'<div style="border-bottom: 1px solid #eee; padding: 4px;">{msg}</div>'
-
-    dashboard = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; border: 1px solid #ccc; padding: 10px; border-radius: 10px; background: #fff;">
-        <div style="display: flex; justify-content: space-between; margin-bottom: 15px;">
-            {player_card}
-            {enemy_card}
-        </div>
-        <div style="background: #f9f9f9; padding: 10px; border-radius: 5px; height: 120px; overflow-y: auto; font-size: 0.9em;">
-            <strong>📜 Battle Log</strong>
-            {log_html}
-        </div>
-    </div>
-    """
-    
-    _render_html(dashboard)
+    if logs:
+        # Show last 5, newest on top
+        log_html = "".join(_LOG_ROW_TMPL.format(msg=_esc(msg)) for msg in _newest_first(logs, 5))
 
-def show_battle_log(messages: List[str]):
+    _render_html(_DASHBOARD_TMPL.format(player_card=player_card, enemy_card=enemy_card, log_html=log_html),
+                 "dashboard" if skip_unchanged else None)
+
+def _show_battle_log_terminal(messages: Iterable[str]):
+    lines = ["--- BATTLE LOG ---"]
+    lines.extend(f"> {msg}" for msg in reversed(_newest_first(messages, 5)))
+    sys.stdout.write("\n".join(lines) + "\n")
+
+@_dispatch(_show_battle_log_terminal)
+def show_battle_log(messages: Iterable[str]):
     """
     (v3.0) 顯示戰鬥日誌視窗。
     """
-    if MODE == "TERMINAL":
-        print("--- BATTLE LOG ---")
-        for msg in messages[-5:]:
-            print(f"> {msg}")
-        return
-    
-    log_html = ""
-    for msg in reversed(messages[-10:]):  # Show last 10, newest on top
-        log_html += f'<div style="border-bottom: 1px solid #eee; padding: 4px;">{msg}</div>'
+    # Show last 10, newest on top
+    log_html = "".join(_LOG_ROW_TMPL.format(msg=_esc(msg)) for msg in _newest_first(messages, 10))
     
-    html = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; border: 2px solid #333; padding: 10px; border-radius: 10px; background: #f9f9f9;">
-        <div style="font-weight: bold; margin-bottom: 10px;">📜 Battle Log</div>
-        <div style="background: #fff; padding: 10px; border-radius: 5px; height: 150px; overflow-y: auto; font-size: 0.9em;">
-            {log_html}
-        </div>
-    </div>
-    """
-    _render_html(html)
+    _render_html(_BATTLE_LOG_TMPL.format(log_html=log_html))
 
+def _show_animation_terminal(frames: List[str], delay: float = 0.5):
+    # 以固定的時間點換格 (monotonic deadline)，print 花的時間不會累積成延遲
+    next_t = time.monotonic()
+    for frame in frames:
+        print(frame)
+        next_t += delay
+        remaining = next_t - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+@_dispatch(_show_animation_terminal)
 def show_animation(frames: List[str], delay: float = 0.5):
     """
     (v3.0) 播放動畫序列。
@@ -414,21 +935,37 @@ def show_animation(frames: List[str], delay: float = 0.5):
         frames: 動畫影格列表（可以是文字或圖片檔名）
         delay: 每個影格之間的延遲時間（秒）
     """
-    if MODE == "TERMINAL":
-        for frame in frames:
-            print(frame)
-            time.sleep(delay)
-        return
-    
-    for frame in frames:
-        clear_output(wait=True)
+    # 整段動畫只輸出一次：每張不同的圖只編碼、傳送一份 (放在 CSS class 裡)，
+    # 各影格依序在 i * delay 秒時顯示，最後一格停留在畫面上
+    frame_css = {}
+    frame_parts = []
+    last = len(frames) - 1
+    for i, frame in enumerate(frames):
+        timing = {"duration": delay, "start": i * delay, "fill": " forwards" if i == last else ""}
         # 判斷是圖片還是文字
         if frame.endswith('.png') or frame.endswith('.jpg'):
-            show_image(frame)
+            try:
+                img_src = _img_data_uri(frame)
+            except Exception as e:
+                print(f"Error loading image: {e}")
+                img_src = None
+            css_class = ""
+            if img_src:
+                css_class, css_rule = _frame_css(img_src)
+                frame_css[css_class] = css_rule  # dict: 重複的圖只留一條規則
+            frame_parts.append(_ANIM_IMG_FRAME_TMPL.format(css_class=css_class, **timing))
         else:
-            print(frame)
-        time.sleep(delay)
+            frame_parts.append(_ANIM_TEXT_FRAME_TMPL.format(text=_esc(frame), **timing))
+
+    _clear_cell()
+    _render_html(_ANIM_TMPL.format(frame_css="\n".join(frame_css.values()), frames="".join(frame_parts)))
+    # 跟以前一樣等動畫播完才返回，之後的輸出不會蓋在動畫上
+    time.sleep(delay * len(frames))
 
+def _play_sound_terminal(sound_name: str):
+    print(f"[SOUND] Playing: {sound_name}")
+
+@_dispatch(_play_sound_terminal)
 def play_sound(sound_name: str):
     """
     (v3.0) 播放音效。
@@ -436,25 +973,44 @@ def play_sound(sound_name: str):
     Args:
         sound_name: 音效名稱 (attack, hit, level_up, game_over, bgm, heal)
     """
-    if MODE == "TERMINAL":
-        print(f"[SOUND] Playing: {sound_name}")
-        return
-    
     if sound_name not in SOUND_LIBRARY:
         print(f"⚠️ Unknown sound: {sound_name}")
         print(f"Available sounds: {', '.join(SOUND_LIBRARY.keys())}")
         return
     
-    url = SOUND_LIBRARY[sound_name]
     try:
-        display(Audio(url=url, autoplay=True))
+        _ensure_ipython()
+        if not _AUDIO_CACHE:
+            # 第一次播放時把內建音效的 Audio 物件一次建好 (只是包住 URL，不會下載)，之後只需查表
+            _AUDIO_CACHE.update((name, Audio(url=url, autoplay=True)) for name, url in SOUND_LIBRARY.items())
+        audio = _AUDIO_CACHE.get(sound_name)
+        if audio is None:
+            audio = _AUDIO_CACHE[sound_name] = Audio(url=SOUND_LIBRARY[sound_name], autoplay=True)
+        display(audio)
     except Exception as e:
         print(f"❌ Failed to play sound: {e}")
 
+def _preload_sounds_terminal():
+    pass
+
+@_dispatch(_preload_sounds_terminal)
+def preload_sounds():
+    """
+    (v3.0) 預先載入所有音效。
+    輸出看不見的 <audio preload> 標籤，讓瀏覽器先下載音檔，
+    第一次 play_sound() 時就不用再等網路。建議在 import 後的 cell 呼叫一次。
+    """
+    _render_html("".join(_SOUND_PRELOAD_TMPL.format(url=url) for url in SOUND_LIBRARY.values()))
+
 # ==========================================
 # v4.0 Features (AI & Chat)
 # ==========================================
 
+def _show_chat_bubble_terminal(speaker: str, message: str, is_user: bool = False, style: str = "normal"):
+    prefix = "You" if is_user else speaker
+    sys.stdout.write(f"[{prefix}]: {message}\n")
+
+@_dispatch(_show_chat_bubble_terminal)
 def show_chat_bubble(speaker: str, message: str, is_user: bool = False, style: str = "normal"):
     """
     (v4.0 New) 顯示聊天氣泡。
@@ -465,48 +1021,20 @@ def show_chat_bubble(speaker: str, message: str, is_user: bool = False, style: s
         is_user: True 表示是使用者 (靠右對齊)，False 表示是 AI (靠左對齊)
         style: 氣泡風格 ("normal", "cute", "tech", "evil")
     """
-    if MODE == "TERMINAL":
-        prefix = "You" if is_user else speaker
-        print(f"[{prefix}]: {message}")
-        return
-
-    align = "right" if is_user else "left"
-    
-    # 根據風格選擇顏色
     if is_user:
-        bg_color = "#DCF8C6"  # WhatsApp green for user
+        # WhatsApp green + 靠右，已寫在 _CHAT_BUBBLE_USER_TMPL
+        html = _CHAT_BUBBLE_USER_TMPL.format(speaker=_esc(speaker), message=_esc(message))
     else:
-        if style == "cute":
-            bg_color = "#FFE5F0"  # Pink
-        elif style == "tech":
-            bg_color = "#E3F2FD"  # Light blue
-        elif style == "evil":
-            bg_color = "#FFEBEE"  # Light red
-        else:
-            bg_color = "#E8E8E8"  # Gray (normal)
-    
-    margin_left = "auto" if is_user else "0"
-    margin_right = "0" if is_user else "auto"
-
-    html = f"""
-    <div style="display: flex; flex-direction: column; align-items: {f'flex-end' if is_user else 'flex-start'}; margin-bottom: 10px;">
-        <div style="font-size: 0.8em; color: #666; margin-bottom: 2px; margin-{align}: 5px;">{speaker}</div>
-        <div style="
-            background-color: {bg_color}; 
-            padding: 8px 12px; 
-            border-radius: 15px; 
-            max-width: 70%; 
-            box-shadow: 1px 1px 2px rgba(0,0,0,0.1);
-            margin-left: {margin_left};
-            margin-right: {margin_right};
-            position: relative;
-        ">
-            {message}
-        </div>
-    </div>
-    """
+        # 根據風格選擇顏色 (未知的風格當成 normal)
+        bg_color = _BUBBLE_COLORS.get(style, "#E8E8E8")
+        html = _CHAT_BUBBLE_AI_TMPL.format(speaker=_esc(speaker), message=_esc(message), bg_color=bg_color)
     _render_html(html)
 
+def _show_thinking_terminal(prompt: str, thinking_time: float = 2.0):
+    sys.stdout.write(f"Thinking about: '{prompt}'...\n")
+    time.sleep(thinking_time)
+
+@_dispatch(_show_thinking_terminal)
 def show_thinking(prompt: str, thinking_time: float = 2.0):
     """
     (v4.0 New) 模擬 AI 思考過程。
@@ -515,30 +1043,19 @@ def show_thinking(prompt: str, thinking_time: float = 2.0):
         prompt: 思考提示訊息
         thinking_time: 模擬思考秒數
     """
-    if MODE == "TERMINAL":
-        print(f"Thinking about: '{prompt}'...")
-        time.sleep(thinking_time)
-        return
-
-    # Visualizing "Thinking"
-    html_thinking = f"""
-    <div style="display: flex; align-items: center; color: #888; margin-bottom: 10px;">
-        <span style="margin-right: 10px;">🧠 {prompt}</span>
-        <div style="
-            width: 10px; height: 10px; background: #888; border-radius: 50%; 
-            animation: pulse 1s infinite;"></div>
-    </div>
-    <style>
-    @keyframes pulse {{
-        0%, 100% {{ opacity: 0.3; }}
-        50% {{ opacity: 1; }}
-    }}
-    </style>
-    """
-    _render_html(html_thinking)
+    # Visualizing "Thinking" — 用具名 display handle，結束時只清空這一塊，不清整個 cell
+    _ensure_ipython()
+    handle = display(HTML(_THINKING_TMPL.format(prompt=_esc(prompt))), display_id=True)
     time.sleep(thinking_time)
-    clear_output(wait=True) # Remove thinking indicator
+    if handle is not None:  # display() returns None outside a live kernel
+        handle.update(HTML("")) # Remove thinking indicator
+
+def _simulate_api_terminal(endpoint: str, data: Dict[str, Any], latency: float = 1.0):
+    sys.stdout.write(f"POST {endpoint}\nData: {data}\n")
+    time.sleep(latency)
+    sys.stdout.write("Response: 200 OK\n")
 
+@_dispatch(_simulate_api_terminal)
 def simulate_api(endpoint: str, data: Dict[str, Any], latency: float = 1.0):
     """
     (v4.0 New) 模擬 API 呼叫過程。
@@ -548,21 +1065,19 @@ def simulate_api(endpoint: str, data: Dict[str, Any], latency: float = 1.0):
         data: 要傳送的資料
         latency: 模擬延遲秒數
     """
-    if MODE == "TERMINAL":
-        print(f"POST {endpoint}")
-        print(f"Data: {data}")
-        time.sleep(latency)
-        print("Response: 200 OK")
-        return
-
     # Packet animation (Simplified)
     print(f"📡 Sending data to {endpoint}...")
-    display(HTML(f"<div style='font-family: monospace; color: blue;'>Payload: {json.dumps(data)}</div>"))
+    _ensure_ipython()
+    display(HTML(f"<div style='font-family: monospace; color: blue;'>Payload: {_esc(_JSON_ENCODE(data))}</div>"))
     time.sleep(latency / 2)
     print("☁️ Processing in Cloud...")
     time.sleep(latency / 2)
     print("✅ Response received (200 OK)")
 
+def _set_mindset_terminal(personality_text: str):
+    sys.stdout.write(f"[SYSTEM] Updating Mindset: {personality_text[:20]}...\n")
+
+@_dispatch(_set_mindset_terminal)
 def set_mindset(personality_text: str):
     """
     (v4.0 New) 視覺化設定 System Prompt。
@@ -570,63 +1085,62 @@ def set_mindset(personality_text: str):
     Args:
         personality_text: 系統人格描述
     """
-    if MODE == "TERMINAL":
-        print(f"[SYSTEM] Updating Mindset: {personality_text[:20]}...")
-        return
-    
-    html = f"""
-    <div style="
-        border: 2px dashed #9C27B0; 
-        background: #F3E5F5; 
-        padding: 10px; 
-        border-radius: 8px; 
-        color: #4A148C; 
-        margin-bottom: 10px;
-    ">
-        <strong>🧠 System Mindset Loaded:</strong><br>
-        <em>"{personality_text}"</em>
-    </div>
-    """
-    _render_html(html)
+    _render_html(_MINDSET_TMPL.format(personality_text=_esc(personality_text)))
 
 # ==========================================
 # v5.0 Features (The Ascension)
 # ==========================================
 
+# 終端機版的獎盃畫面是固定的，一次寫出
+_CELEBRATE_TEXT = "\n".join([
+    "🎉 CONGRATULATIONS! 🎉",
+    "      '._==_==_=_.'     ",
+    "      .-\\:      /-.    ",
+    "     | (|:.     |) |    ",
+    "      '-|:.     |-'     ",
+    "        \\::.    /      ",
+    "         '::. .'        ",
+    "           ) (          ",
+    "         _.' '._        ",
+    "[SOUND] Playing level_up sound.",
+]) + "\n"
+
+def _celebrate_terminal():
+    sys.stdout.write(_CELEBRATE_TEXT)
+
+@_dispatch(_celebrate_terminal)
 def celebrate():
     """
     (v5.0 New) 播放慶祝動畫和音效。
     用於遊戲勝利、升級、或課程完成時。
     """
-    if MODE == "TERMINAL":
-        print("🎉 CONGRATULATIONS! 🎉")
-        print("      '._==_==_=_.'     ")
-        print("      .-\\:      /-.    ")
-        print("     | (|:.     |) |    ")
-        print("      '-|:.     |-'     ")
-        print("        \\::.    /      ")
-        print("         '::. .'        ")
-        print("           ) (          ")
-        print("         _.' '._        ")
-        print("[SOUND] Playing level_up sound.")
-        return
-    
-    # 顯示慶祝動畫
-    celebration_html = """
-    <div style="text-align: center; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 15px; color: white; font-family: Arial, sans-serif;">
-        <div style="font-size: 3em; margin-bottom: 10px;">🎉</div>
-        <div style="font-size: 2em; font-weight: bold; margin-bottom: 10px;">CONGRATULATIONS!</div>
-        <div style="font-size: 1.2em;">You did it! 🎊</div>
-        <div style="margin-top: 20px; font-size: 4em;">
-            🏆
-        </div>
-    </div>
-    """
-    _render_html(celebration_html)
+    global _CELEBRATE_HTML_OBJ
+    # 顯示慶祝動畫 (BatchRenderer 區塊內照樣先收集)
+    if _BATCH_BUF is None:
+        _ensure_ipython()
+        if _CELEBRATE_HTML_OBJ is None:
+            _CELEBRATE_HTML_OBJ = HTML(_CELEBRATE_HTML)
+        display(_CELEBRATE_HTML_OBJ)
+    else:
+        _render_html(_CELEBRATE_HTML)
     
     # 播放音效
     play_sound("level_up")
 
+def _show_credits_terminal(author_name: str = "Unknown"):
+    lines = [
+        "=== CREDITS ===",
+        f"Director: {author_name}",
+        "Art: Ys the Cat",
+        "Engine: Python 3",
+        "Library: pet_lib v5.0",
+        "Based on: Cyber-Pet Course",
+        "THANK YOU FOR PLAYING!",
+        "[SOUND] Playing heal sound."
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+@_dispatch(_show_credits_terminal)
 def show_credits(author_name: str = "Unknown"):
     """
     (v5.0 New) 顯示遊戲工作人員名單。
@@ -634,49 +1148,8 @@ def show_credits(author_name: str = "Unknown"):
     Args:
         author_name: 作者/導演名字
     """
-    if MODE == "TERMINAL":
-        lines = [
-            "=== CREDITS ===",
-            f"Director: {author_name}",
-            "Art: Ys the Cat",
-            "Engine: Python 3",
-            "Library: pet_lib v5.0",
-            "Based on: Cyber-Pet Course",
-            "THANK YOU FOR PLAYING!"
-        ]
-        print("\n".join(lines))
-        print("[SOUND] Playing heal sound.")
-        return
-    
     # 製作捲動字幕效果
-    credits_html = f"""
-    <div style="
-        background: linear-gradient(to bottom, #1a1a2e, #16213e); 
-        color: #eee; 
-        padding: 30px; 
-        border-radius: 10px; 
-        font-family: 'Courier New', monospace;
-        text-align: center;
-        max-width: 500px;
-        margin: 0 auto;
-    ">
-        <div style="font-size: 2em; margin-bottom: 20px; color: #ffd700;">✨ CREDITS ✨</div>
-        <div style="font-size: 1.2em; line-height: 2em;">
-            <div style="margin: 10px 0;"><strong>Director:</strong> {author_name}</div>
-            <div style="margin: 10px 0;"><strong>Art:</strong> Ys the Cat 🐱</div>
-            <div style="margin: 10px 0;"><strong>Engine:</strong> Python 3 🐍</div>
-            <div style="margin: 10px 0;"><strong>Library:</strong> pet_lib v5.0</div>
-            <div style="margin: 10px 0;"><strong>Based on:</strong> Cyber-Pet Course</div>
-        </div>
-        <div style="margin-top: 30px; font-size: 1.5em; color: #ffd700;">
-            THANK YOU FOR PLAYING!
-        </div>
-        <div style="margin-top: 20px; font-size: 2em;">
-            🎮 🎯 🎨
-        </div>
-    </div>
-    """
-    _render_html(credits_html)
+    _render_html(_CREDITS_PREFIX + _esc(author_name) + _CREDITS_SUFFIX)
     
     # 播放音效
     play_sound("heal")